@@ -0,0 +1,54 @@
+"""date range availability
+
+Revision ID: 3c1f0e7a9b21
+Revises: 90576dfd9870
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f0e7a9b21'
+down_revision: Union[str, Sequence[str], None] = '90576dfd9870'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_rental_items_rental_id'), 'rental_items', ['rental_id'], unique=False)
+    op.create_index(op.f('ix_rental_items_equipment_id'), 'rental_items', ['equipment_id'], unique=False)
+    # Брони больше не уменьшают quantity_available (занятость считается по датам),
+    # поэтому возвращаем на склад количество, списанное существующими бронями
+    op.execute("""
+        UPDATE equipment
+        SET quantity_available = equipment.quantity_available + booked.quantity
+        FROM (
+            SELECT ri.equipment_id, SUM(ri.quantity) AS quantity
+            FROM rental_items ri
+            JOIN rentals r ON r.id = ri.rental_id
+            WHERE r.status = 'booked' AND r.is_deleted = false AND ri.is_deleted = false
+            GROUP BY ri.equipment_id
+        ) AS booked
+        WHERE equipment.id = booked.equipment_id
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        UPDATE equipment
+        SET quantity_available = equipment.quantity_available - booked.quantity
+        FROM (
+            SELECT ri.equipment_id, SUM(ri.quantity) AS quantity
+            FROM rental_items ri
+            JOIN rentals r ON r.id = ri.rental_id
+            WHERE r.status = 'booked' AND r.is_deleted = false AND ri.is_deleted = false
+            GROUP BY ri.equipment_id
+        ) AS booked
+        WHERE equipment.id = booked.equipment_id
+    """)
+    op.drop_index(op.f('ix_rental_items_equipment_id'), table_name='rental_items')
+    op.drop_index(op.f('ix_rental_items_rental_id'), table_name='rental_items')
@@ -0,0 +1,55 @@
+"""equipment daily occupancy
+
+Revision ID: 7d2a4c9e5f10
+Revises: 3c1f0e7a9b21
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2a4c9e5f10'
+down_revision: Union[str, Sequence[str], None] = '3c1f0e7a9b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('equipment_daily_occupancy',
+    sa.Column('equipment_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('store_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False, server_default=sa.false()),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['equipment_id'], ['equipment.id'], ),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('equipment_id', 'day')
+    )
+    op.create_index(op.f('ix_equipment_daily_occupancy_store_id'), 'equipment_daily_occupancy', ['store_id'], unique=False)
+    # Заполняем таблицу по текущим броням и выдачам
+    op.execute("""
+        INSERT INTO equipment_daily_occupancy (equipment_id, day, store_id, quantity, is_deleted)
+        SELECT ri.equipment_id, d.day::date, e.store_id, SUM(ri.quantity), false
+        FROM rental_items ri
+        JOIN rentals r ON r.id = ri.rental_id
+        JOIN equipment e ON e.id = ri.equipment_id
+        CROSS JOIN LATERAL generate_series(
+            r.date_start,
+            CASE WHEN r.status IN ('active', 'overdue') THEN GREATEST(r.date_end, CURRENT_DATE) ELSE r.date_end END,
+            interval '1 day'
+        ) AS d(day)
+        WHERE r.status IN ('booked', 'active', 'overdue')
+          AND r.is_deleted = false AND ri.is_deleted = false
+        GROUP BY ri.equipment_id, d.day, e.store_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_equipment_daily_occupancy_store_id'), table_name='equipment_daily_occupancy')
+    op.drop_table('equipment_daily_occupancy')
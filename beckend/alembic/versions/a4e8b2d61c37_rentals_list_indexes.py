@@ -0,0 +1,32 @@
+"""rentals list indexes
+
+Revision ID: a4e8b2d61c37
+Revises: 7d2a4c9e5f10
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4e8b2d61c37'
+down_revision: Union[str, Sequence[str], None] = '7d2a4c9e5f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_rentals_store_date_start_id', 'rentals', ['store_id', 'date_start', 'id'], unique=False)
+    op.create_index('ix_rentals_store_status_date_start', 'rentals', ['store_id', 'status', 'date_start'], unique=False)
+    op.create_index('ix_rentals_client_date_start', 'rentals', ['client_id', 'date_start'], unique=False)
+    op.create_index('ix_rentals_admin_date_start', 'rentals', ['admin_id', 'date_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_rentals_admin_date_start', table_name='rentals')
+    op.drop_index('ix_rentals_client_date_start', table_name='rentals')
+    op.drop_index('ix_rentals_store_status_date_start', table_name='rentals')
+    op.drop_index('ix_rentals_store_date_start_id', table_name='rentals')
@@ -0,0 +1,53 @@
+"""equipment stock ledger
+
+Revision ID: a9d1e5b7c204
+Revises: f2b6c4d8e193
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d1e5b7c204'
+down_revision: Union[str, Sequence[str], None] = 'f2b6c4d8e193'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Системные движения (пересчёт остатков) пишутся без пользователя
+    op.alter_column('equipment_movements', 'performed_by', existing_type=sa.Integer(), nullable=True)
+    op.create_index('ix_equipment_movements_equipment_id_id', 'equipment_movements', ['equipment_id', 'id'], unique=False)
+    op.create_table('equipment_stock_snapshots',
+    sa.Column('equipment_id', sa.Integer(), nullable=False),
+    sa.Column('movement_id', sa.Integer(), nullable=False),
+    sa.Column('quantity_available', sa.Integer(), nullable=False),
+    sa.Column('taken_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False, server_default=sa.false()),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['equipment_id'], ['equipment.id'], ),
+    sa.PrimaryKeyConstraint('equipment_id')
+    )
+    # Журнал до этой миграции не вёлся: текущие остатки становятся первой контрольной точкой,
+    # уже существующие движения считаются в неё вошедшими
+    op.execute("""
+        INSERT INTO equipment_stock_snapshots (equipment_id, movement_id, quantity_available, taken_at, is_deleted)
+        SELECT e.id,
+               (SELECT COALESCE(MAX(m.id), 0) FROM equipment_movements m),
+               COALESCE(e.quantity_available, 0),
+               now(),
+               false
+        FROM equipment e
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('equipment_stock_snapshots')
+    op.drop_index('ix_equipment_movements_equipment_id_id', table_name='equipment_movements')
+    op.execute("DELETE FROM equipment_movements WHERE performed_by IS NULL")
+    op.alter_column('equipment_movements', 'performed_by', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,87 @@
+"""store daily stats
+
+Revision ID: b7f3d9a15c62
+Revises: e51c7a2f9d84
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.sketch import build_sketch
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f3d9a15c62'
+down_revision: Union[str, Sequence[str], None] = 'e51c7a2f9d84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('store_daily_stats',
+    sa.Column('store_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('rentals', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('cash', sa.Float(), nullable=False),
+    sa.Column('card', sa.Float(), nullable=False),
+    sa.Column('clients_sketch', sa.LargeBinary(), nullable=True),
+    sa.Column('booked', sa.Integer(), nullable=False),
+    sa.Column('active', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('overdue', sa.Integer(), nullable=False),
+    sa.Column('cancelled', sa.Integer(), nullable=False),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False, server_default=sa.false()),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('store_id', 'day')
+    )
+    # Заполняем сводку по всей истории аренд
+    op.execute("""
+        INSERT INTO store_daily_stats (
+            store_id, day, rentals, revenue, cash, card,
+            booked, active, completed, overdue, cancelled, is_deleted
+        )
+        SELECT r.store_id, r.date_start, COUNT(*), COALESCE(SUM(r.total_amount), 0),
+               COALESCE(SUM(p.cash), 0), COALESCE(SUM(p.card), 0),
+               COUNT(*) FILTER (WHERE r.status = 'booked'),
+               COUNT(*) FILTER (WHERE r.status = 'active'),
+               COUNT(*) FILTER (WHERE r.status = 'completed'),
+               COUNT(*) FILTER (WHERE r.status = 'overdue'),
+               COUNT(*) FILTER (WHERE r.status = 'cancelled'),
+               false
+        FROM rentals r
+        LEFT JOIN (
+            SELECT rental_id,
+                   SUM(amount) FILTER (WHERE method = 'cash') AS cash,
+                   SUM(amount) FILTER (WHERE method = 'card') AS card
+            FROM rental_payments
+            WHERE is_deleted = false
+            GROUP BY rental_id
+        ) p ON p.rental_id = r.id
+        WHERE r.is_deleted = false
+        GROUP BY r.store_id, r.date_start
+    """)
+    # Скетчи уникальных клиентов считаются в Python (app/core/sketch.py)
+    conn = op.get_bind()
+    clients = {}
+    for store_id, day, client_id in conn.execute(sa.text(
+        "SELECT DISTINCT store_id, date_start, client_id FROM rentals WHERE is_deleted = false"
+    )):
+        clients.setdefault((store_id, day), []).append(client_id)
+    if clients:
+        conn.execute(
+            sa.text("UPDATE store_daily_stats SET clients_sketch = :sketch WHERE store_id = :store_id AND day = :day"),
+            [
+                {'store_id': store_id, 'day': day, 'sketch': build_sketch(client_ids)}
+                for (store_id, day), client_ids in clients.items()
+            ],
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('store_daily_stats')
@@ -0,0 +1,63 @@
+"""client metrics
+
+Revision ID: c3e8a7f42d19
+Revises: b7f3d9a15c62
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a7f42d19'
+down_revision: Union[str, Sequence[str], None] = 'b7f3d9a15c62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('client_metrics',
+    sa.Column('client_id', sa.Integer(), nullable=False),
+    sa.Column('store_id', sa.Integer(), nullable=True),
+    sa.Column('rentals', sa.Integer(), nullable=False),
+    sa.Column('monetary', sa.Float(), nullable=False),
+    sa.Column('avg_check', sa.Float(), nullable=False),
+    sa.Column('first_rental', sa.Date(), nullable=True),
+    sa.Column('last_rental', sa.Date(), nullable=True),
+    sa.Column('avg_rental_days', sa.Float(), nullable=False),
+    sa.Column('overdue_rentals', sa.Integer(), nullable=False),
+    sa.Column('overdue_rate', sa.Float(), nullable=False),
+    sa.Column('r_score', sa.Integer(), nullable=True),
+    sa.Column('f_score', sa.Integer(), nullable=True),
+    sa.Column('m_score', sa.Integer(), nullable=True),
+    sa.Column('rfm', sa.Integer(), nullable=True),
+    sa.Column('segment', sa.String(length=32), nullable=True),
+    sa.Column('computed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False, server_default=sa.false()),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['client_id'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('client_id')
+    )
+    op.create_index(op.f('ix_client_metrics_rfm'), 'client_metrics', ['rfm'], unique=False)
+    op.create_index('ix_client_metrics_store_segment', 'client_metrics', ['store_id', 'segment'], unique=False)
+    op.create_index('ix_client_metrics_store_monetary', 'client_metrics', ['store_id', 'monetary'], unique=False)
+    op.create_index('ix_client_metrics_store_last_rental', 'client_metrics', ['store_id', 'last_rental'], unique=False)
+    op.create_index('ix_rentals_updated_at', 'rentals', ['updated_at'], unique=False)
+    op.create_index('ix_rentals_created_at', 'rentals', ['created_at'], unique=False)
+    # Таблица заполняется первым запуском фоновой задачи (пустая таблица — полный пересчёт)
+    # или скриптом scripts/rebuild_client_metrics.py
+
+
+def downgrade() -> None:
+    op.drop_index('ix_rentals_created_at', table_name='rentals')
+    op.drop_index('ix_rentals_updated_at', table_name='rentals')
+    op.drop_index('ix_client_metrics_store_last_rental', table_name='client_metrics')
+    op.drop_index('ix_client_metrics_store_monetary', table_name='client_metrics')
+    op.drop_index('ix_client_metrics_store_segment', table_name='client_metrics')
+    op.drop_index(op.f('ix_client_metrics_rfm'), table_name='client_metrics')
+    op.drop_table('client_metrics')
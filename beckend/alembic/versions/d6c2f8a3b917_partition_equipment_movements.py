@@ -0,0 +1,124 @@
+"""partition equipment movements
+
+Revision ID: d6c2f8a3b917
+Revises: a9d1e5b7c204
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6c2f8a3b917'
+down_revision: Union[str, Sequence[str], None] = 'a9d1e5b7c204'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = 'id, equipment_id, rental_id, action, quantity, performed_by, "timestamp", is_deleted, created_at, updated_at'
+
+
+def _create_indexes() -> None:
+    op.create_index(op.f('ix_equipment_movements_id'), 'equipment_movements', ['id'], unique=False)
+    op.create_index('ix_equipment_movements_equipment_id_id', 'equipment_movements', ['equipment_id', 'id'], unique=False)
+
+
+def upgrade() -> None:
+    # Старая таблица уходит в сторону вместе с последовательностью id
+    op.drop_index('ix_equipment_movements_equipment_id_id', table_name='equipment_movements')
+    op.drop_index(op.f('ix_equipment_movements_id'), table_name='equipment_movements')
+    op.execute("ALTER TABLE equipment_movements RENAME TO equipment_movements_old")
+    op.execute("ALTER TABLE equipment_movements_old RENAME CONSTRAINT equipment_movements_pkey TO equipment_movements_old_pkey")
+    op.execute("ALTER SEQUENCE equipment_movements_id_seq OWNED BY NONE")
+
+    # Секционированная по месяцам таблица: ключ секционирования должен входить в первичный ключ
+    op.execute("""
+        CREATE TABLE equipment_movements (
+            id INTEGER NOT NULL DEFAULT nextval('equipment_movements_id_seq'),
+            equipment_id INTEGER NOT NULL REFERENCES equipment (id),
+            rental_id INTEGER REFERENCES rentals (id),
+            action VARCHAR NOT NULL,
+            quantity INTEGER NOT NULL,
+            performed_by INTEGER REFERENCES users (id),
+            "timestamp" TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            is_deleted BOOLEAN NOT NULL DEFAULT false,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            updated_at TIMESTAMP WITH TIME ZONE,
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+    """)
+    op.execute("ALTER SEQUENCE equipment_movements_id_seq OWNED BY equipment_movements.id")
+    # Секции с месяца первого движения и на три месяца вперёд; дальше их создаёт ensure_movement_partitions
+    # (при старте приложения, в планировщике и scripts/ensure_movement_partitions.py).
+    # Строки вне секций попадают в секцию по умолчанию и переносятся оттуда при создании секции
+    op.execute("""
+        DO $$
+        DECLARE
+            month_start date;
+        BEGIN
+            FOR month_start IN
+                SELECT generate_series(
+                    date_trunc('month', COALESCE((SELECT MIN("timestamp") FROM equipment_movements_old), now())),
+                    date_trunc('month', now()) + interval '3 months',
+                    interval '1 month'
+                )::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF equipment_movements FOR VALUES FROM (%L) TO (%L)',
+                    'equipment_movements_' || to_char(month_start, 'YYYY_MM'),
+                    month_start,
+                    (month_start + interval '1 month')::date
+                );
+            END LOOP;
+        END $$
+    """)
+    op.execute("CREATE TABLE equipment_movements_default PARTITION OF equipment_movements DEFAULT")
+
+    op.execute(f"""
+        INSERT INTO equipment_movements ({COLUMNS})
+        SELECT id, equipment_id, rental_id, action, quantity, performed_by,
+               COALESCE("timestamp", created_at, now()), is_deleted, created_at, updated_at
+        FROM equipment_movements_old
+    """)
+    op.drop_table('equipment_movements_old')
+
+    _create_indexes()
+    op.create_index('ix_equipment_movements_equipment_id_timestamp', 'equipment_movements', ['equipment_id', 'timestamp'], unique=False)
+    op.create_index('ix_equipment_movements_performed_by_timestamp', 'equipment_movements', ['performed_by', 'timestamp'], unique=False)
+    op.create_index('ix_equipment_movements_timestamp_id', 'equipment_movements', ['timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE equipment_movements RENAME TO equipment_movements_partitioned")
+    op.execute("ALTER INDEX equipment_movements_pkey RENAME TO equipment_movements_partitioned_pkey")
+    for name in (
+        'ix_equipment_movements_timestamp_id',
+        'ix_equipment_movements_performed_by_timestamp',
+        'ix_equipment_movements_equipment_id_timestamp',
+        'ix_equipment_movements_equipment_id_id',
+        'ix_equipment_movements_id',
+    ):
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER SEQUENCE equipment_movements_id_seq OWNED BY NONE")
+    op.create_table('equipment_movements',
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('equipment_movements_id_seq')"), nullable=False),
+    sa.Column('equipment_id', sa.Integer(), nullable=False),
+    sa.Column('rental_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('performed_by', sa.Integer(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['equipment_id'], ['equipment.id'], ),
+    sa.ForeignKeyConstraint(['performed_by'], ['users.id'], ),
+    sa.ForeignKeyConstraint(['rental_id'], ['rentals.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("ALTER SEQUENCE equipment_movements_id_seq OWNED BY equipment_movements.id")
+    op.execute(f"INSERT INTO equipment_movements ({COLUMNS}) SELECT {COLUMNS} FROM equipment_movements_partitioned")
+    op.execute("DROP TABLE equipment_movements_partitioned CASCADE")
+    _create_indexes()
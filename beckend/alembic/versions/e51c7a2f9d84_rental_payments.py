@@ -0,0 +1,92 @@
+"""rental payments
+
+Revision ID: e51c7a2f9d84
+Revises: a4e8b2d61c37
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e51c7a2f9d84'
+down_revision: Union[str, Sequence[str], None] = 'a4e8b2d61c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _parse_payment_note(comment: str) -> dict:
+    """Разбирает старые заметки вида 'cash:123; card:456' (возможно, после ' | ')"""
+    totals = {'cash': 0.0, 'card': 0.0}
+    for part in str(comment).split('|'):
+        for method in totals:
+            idx = part.find(f'{method}:')
+            if idx < 0:
+                continue
+            try:
+                totals[method] += float(part[idx + len(method) + 1:].split(';')[0].strip() or 0)
+            except ValueError:
+                continue
+    return totals
+
+
+def upgrade() -> None:
+    payment_method = sa.Enum('cash', 'card', name='paymentmethod')
+    op.create_table('rental_payments',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rental_id', sa.Integer(), nullable=False),
+    sa.Column('method', payment_method, nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('taken_by', sa.Integer(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=False),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False, server_default=sa.false()),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['rental_id'], ['rentals.id'], ),
+    sa.ForeignKeyConstraint(['taken_by'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_rental_payments_id'), 'rental_payments', ['id'], unique=False)
+    op.create_index(op.f('ix_rental_payments_rental_id'), 'rental_payments', ['rental_id'], unique=False)
+    op.create_index(op.f('ix_rental_payments_timestamp'), 'rental_payments', ['timestamp'], unique=False)
+
+    # Переносим оплаты, которые раньше записывались в комментарий аренды
+    conn = op.get_bind()
+    rentals = conn.execute(sa.text("""
+        SELECT id, comment, admin_id, COALESCE(updated_at, created_at) AS paid_at, date_end
+        FROM rentals
+        WHERE comment LIKE '%cash:%' OR comment LIKE '%card:%'
+    """)).all()
+    rows = []
+    for rental in rentals:
+        paid_at = rental.paid_at or datetime.combine(rental.date_end, datetime.min.time())
+        for method, amount in _parse_payment_note(rental.comment).items():
+            if amount > 0:
+                rows.append({
+                    'rental_id': rental.id,
+                    'method': method,
+                    'amount': amount,
+                    'taken_by': rental.admin_id,
+                    'timestamp': paid_at,
+                })
+    if rows:
+        payments = sa.table('rental_payments',
+            sa.column('rental_id', sa.Integer()),
+            sa.column('method', payment_method),
+            sa.column('amount', sa.Float()),
+            sa.column('taken_by', sa.Integer()),
+            sa.column('timestamp', sa.DateTime()),
+        )
+        op.bulk_insert(payments, rows)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_rental_payments_timestamp'), table_name='rental_payments')
+    op.drop_index(op.f('ix_rental_payments_rental_id'), table_name='rental_payments')
+    op.drop_index(op.f('ix_rental_payments_id'), table_name='rental_payments')
+    op.drop_table('rental_payments')
+    sa.Enum(name='paymentmethod').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,41 @@
+"""demand forecasts
+
+Revision ID: f2b6c4d8e193
+Revises: c3e8a7f42d19
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b6c4d8e193'
+down_revision: Union[str, Sequence[str], None] = 'c3e8a7f42d19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('demand_forecasts',
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('store_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Float(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('is_deleted', sa.Boolean(), nullable=False, server_default=sa.false()),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['categories.id'], ),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('category_id', 'day')
+    )
+    op.create_index(op.f('ix_demand_forecasts_store_id'), 'demand_forecasts', ['store_id'], unique=False)
+    # Прогноз заполняется фоновой задачей планировщика при первом запуске
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_demand_forecasts_store_id'), table_name='demand_forecasts')
+    op.drop_table('demand_forecasts')
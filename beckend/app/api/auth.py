@@ -2,9 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from fastapi.security import OAuth2PasswordRequestForm
-from app.schemas.user import UserCreate, UserRead, UserLogin, Token
-from app.crud.user import get_user_by_email, create_user, verify_password
-from app.core.auth import create_access_token, get_current_user
+from app.schemas.user import UserCreate, UserRead, UserLogin, Token, Principal
+from app.crud.user import get_user_by_email, create_user
+from app.core.auth import create_access_token, get_current_user, get_user_by_id, verify_password_async
 from app.db.session import get_db
 from app.models.user import UserRole, User
 from app.models.store import Store
@@ -22,7 +22,10 @@ async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)):
 @router.post("/login", response_model=Token)
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     user = await get_user_by_email(db, form_data.username)
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    # Возвращаем соединение в пул до проверки пароля: в очереди на bcrypt запрос может ждать
+    # секунды, и при шторме логинов пул иначе заняли бы они, а не остальные эндпоинты
+    await db.close()
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(status_code=401, detail="Incorrect email or password")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -30,7 +33,11 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSessi
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/me", response_model=UserRead)
-async def me(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def me(principal: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # В кэше авторизации только основные поля, профиль целиком читаем из БД
+    current_user = await get_user_by_id(db, principal.id)
+    if current_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
     store_name = None
     if current_user.store_id is not None:
         try:
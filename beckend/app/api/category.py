@@ -3,7 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.schemas.category import CategoryCreate, CategoryRead, CategoryUpdate
 from app.crud.category import create_category, get_category, get_categories, update_category, delete_category
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db
 from app.crud import store as store_crud
 from app.core.auth import require_role, get_current_user
 from app.schemas.user import UserRole
@@ -31,7 +31,7 @@ async def read_all(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(g
 
 # Публичный список категорий по slug магазина (без авторизации)
 @router.get("/public", response_model=List[CategoryRead])
-async def public_read_all(store_slug: str = None, skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+async def public_read_all(store_slug: str = None, skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_read_db)):
     store_id = None
     if store_slug:
         store = await store_crud.get_store_by_slug(db, store_slug)
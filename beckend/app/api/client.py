@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from app.schemas.user import UserCreate, UserRead, UserUpdate, ClientCommentCreate, ClientCommentRead
+from typing import List, Optional
+from app.schemas.user import UserCreate, UserRead, UserUpdate, ClientCommentCreate, ClientCommentRead, ClientAnalyticsRead
 from app.crud.user import create_client, get_clients, delete_client, update_user, get_user
-from app.db.session import get_db
+from app.crud.client_metrics import get_client_analytics, SEGMENTS, ANALYTICS_SORT_FIELDS
+from app.db.session import get_db, get_read_db
 from app.core.auth import require_role, get_current_user
 from app.models.user import UserRole
 from app.models.user import User
@@ -23,7 +24,7 @@ async def create(user_in: UserCreate, db: AsyncSession = Depends(get_db), curren
     return await create_client(db, user_in)
 
 @router.get("/", response_model=List[UserRead], dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
-async def read_all(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def read_all(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
     try:
         # Для superadmin показываем все данные, для остальных только их магазин
         store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
@@ -34,6 +35,29 @@ async def read_all(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(g
         print(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@router.get("/analytics", response_model=List[ClientAnalyticsRead], dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
+async def analytics(
+    response: Response,
+    segment: Optional[str] = None,
+    sort: str = "rfm",
+    order: str = Query(default="desc", description="asc | desc"),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """RFM-показатели клиентов (обновляются фоновой задачей); общее число — в заголовке X-Total-Count"""
+    if segment is not None and segment not in SEGMENTS:
+        raise HTTPException(status_code=400, detail=f"segment must be one of: {', '.join(SEGMENTS)}")
+    if sort not in ANALYTICS_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of: {', '.join(ANALYTICS_SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
+    rows, total = await get_client_analytics(db, store_id, segment, sort, order == "desc", skip, limit)
+    response.headers["X-Total-Count"] = str(total)
+    return rows
+
 @router.get("/{user_id}", response_model=UserRead, dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
 async def read_one(user_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     try:
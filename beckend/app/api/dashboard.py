@@ -1,21 +1,88 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
-from typing import Optional
+from typing import Awaitable, Callable, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from sqlalchemy import func, true
 from datetime import date, datetime, timedelta
-from app.db.session import get_db
+from app.db.session import get_read_db
 from app.models.equipment import Equipment
 from app.models.rental import Rental
+from app.crud.store_stats import period_totals_query, count_unique_clients, status_counts as period_status_counts, get_timeseries, GRANULARITIES
 from app.models.user import User
+from app.crud.utilization import get_utilization
+from app.crud.forecast import get_forecast, FORECAST_WEEKS
 from app.core.auth import require_role, get_current_user
+from app.core.dashboard_cache import dashboard_cache, dashboard_single_flight, store_version
 from app.schemas.user import UserRole
 
 router = APIRouter(prefix="/dashboard", tags=["dashboard"], dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
 
+# Самый длинный период для графиков (в днях)
+MAX_TIMESERIES_DAYS = 366 * 5
+MAX_UTILIZATION_DAYS = 366 * 2
+
+def _stats_query(store_id: Optional[int], start_date: date, end_date: date, today: date):
+    """Все агрегаты дашборда одним запросом: техника + суммы из дневной сводки store_daily_stats"""
+    # Equipment stats (store-scoped)
+    equipment_query = select(
+        func.count().label("total_equipment"),
+        func.coalesce(func.sum(Equipment.quantity_available), 0).label("available"),
+        func.coalesce(func.sum(Equipment.quantity_total - Equipment.quantity_available), 0).label("busy"),
+    ).where(Equipment.is_deleted == False)
+    if store_id:
+        equipment_query = equipment_query.where(Equipment.store_id == store_id)
+
+    # Rentals, revenue, payments and statuses for selected range (inclusive) plus legacy today fields
+    equipment_stats = equipment_query.subquery()
+    period_stats = period_totals_query(start_date, end_date, store_id, today=today).subquery()
+    return select(equipment_stats, period_stats).select_from(equipment_stats.join(period_stats, true()))
+
+def _history_query(store_id: Optional[int], start_date: date, end_date: date, history_limit: int):
+    """Последние аренды периода вместе с именами клиента и администратора"""
+    client = aliased(User)
+    admin = aliased(User)
+    query = (
+        select(
+            Rental.id,
+            Rental.client_id,
+            client.full_name.label("client_full_name"),
+            Rental.admin_id,
+            admin.full_name.label("admin_full_name"),
+            Rental.date_start,
+            Rental.date_end,
+            Rental.total_amount,
+            Rental.status,
+            Rental.comment,
+        )
+        .join(client, Rental.client_id == client.id)
+        .outerjoin(admin, Rental.admin_id == admin.id)
+        .where(Rental.is_deleted == False, Rental.date_start >= start_date, Rental.date_start <= end_date)
+        .order_by(Rental.date_start.desc(), Rental.id.desc())
+        .limit(history_limit)
+    )
+    if store_id:
+        query = query.where(Rental.store_id == store_id)
+    return query
+
+async def _cached(key: tuple, store_id: Optional[int], compute: Callable[[], Awaitable[dict]]) -> dict:
+    """Ответ из кэша дашборда; в ключ входит версия данных магазина, поэтому любая запись его сбрасывает"""
+    cache_key = (*key, store_version(store_id))
+    cached = dashboard_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    async def compute_and_store():
+        result = await compute()
+        dashboard_cache.set(cache_key, result)
+        return result
+
+    # Concurrent misses for the same key wait for a single computation
+    return await dashboard_single_flight.run(cache_key, compute_and_store)
+
 @router.get("/")
 async def dashboard(
-    db: AsyncSession = Depends(get_db), 
+    db: AsyncSession = Depends(get_read_db), 
     current_user: User = Depends(get_current_user),
     period: Optional[str] = Query(default=None, description="today | yesterday | custom"),
     date_from: Optional[str] = Query(default=None, description="YYYY-MM-DD"),
@@ -25,22 +92,6 @@ async def dashboard(
     # Store scope
     store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
 
-    # Equipment stats (store-scoped)
-    equipment_query = select(func.count()).select_from(Equipment).where(Equipment.is_deleted == False)
-    if store_id:
-        equipment_query = equipment_query.where(Equipment.store_id == store_id)
-    total_equipment = await db.scalar(equipment_query)
-
-    available_query = select(func.sum(Equipment.quantity_available)).where(Equipment.is_deleted == False)
-    if store_id:
-        available_query = available_query.where(Equipment.store_id == store_id)
-    available = await db.scalar(available_query) or 0
-
-    busy_query = select(func.sum(Equipment.quantity_total - Equipment.quantity_available)).where(Equipment.is_deleted == False)
-    if store_id:
-        busy_query = busy_query.where(Equipment.store_id == store_id)
-    busy = await db.scalar(busy_query) or 0
-
     # Resolve period range
     start_date: Optional[date] = None
     end_date: Optional[date] = None
@@ -68,105 +119,36 @@ async def dashboard(
         start_date = today
         end_date = today
 
-    # Rentals and revenue for selected range (inclusive)
-    base_range_filters = [
-        Rental.is_deleted == False,
-        Rental.date_start >= start_date,
-        Rental.date_start <= end_date,
-    ]
-    rentals_range_query = select(func.count()).select_from(Rental).where(*base_range_filters)
-    if store_id:
-        rentals_range_query = rentals_range_query.where(Rental.store_id == store_id)
-    rentals_count = await db.scalar(rentals_range_query) or 0
-
-    revenue_range_query = select(func.sum(Rental.total_amount)).where(*base_range_filters)
-    if store_id:
-        revenue_range_query = revenue_range_query.where(Rental.store_id == store_id)
-    revenue_total = await db.scalar(revenue_range_query) or 0
-
-    # Unique clients in range
-    unique_clients_query = select(func.count(func.distinct(Rental.client_id))).where(*base_range_filters)
-    if store_id:
-        unique_clients_query = unique_clients_query.where(Rental.store_id == store_id)
-    unique_clients = await db.scalar(unique_clients_query) or 0
-
-    # Status distribution in range
-    status_query = select(Rental.status, func.count()).where(*base_range_filters)
-    if store_id:
-        status_query = status_query.where(Rental.store_id == store_id)
-    status_query = status_query.group_by(Rental.status)
-    status_result = await db.execute(status_query)
-    status_counts = {str(status): count for status, count in status_result.all()}
-
-    # Parse payments from comments for cash/card aggregation (temporary solution)
-    payments_query = select(Rental.comment).where(*base_range_filters)
-    if store_id:
-        payments_query = payments_query.where(Rental.store_id == store_id)
-    payments_result = await db.execute(payments_query)
-    cash_total = 0.0
-    card_total = 0.0
-    for (comment,) in payments_result.all():
-        if not comment:
-            continue
-        try:
-            # look for patterns like 'cash:123; card:456'
-            parts = str(comment).split('|')
-            for part in parts:
-                if 'cash:' in part:
-                    val = part.split('cash:')[1].split(';')[0].strip()
-                    cash_total += float(val or 0)
-                if 'card:' in part:
-                    # handle both 'card:123' and '; card:123'
-                    idx = part.find('card:')
-                    if idx >= 0:
-                        val = part[idx+5:].split(';')[0].strip()
-                        card_total += float(val or 0)
-        except Exception:
-            continue
+    return await _cached(
+        ("dashboard", store_id, start_date, end_date, today, history_limit),
+        store_id,
+        lambda: _build_dashboard(db, store_id, start_date, end_date, today, history_limit),
+    )
+
+async def _build_dashboard(
+    db: AsyncSession,
+    store_id: Optional[int],
+    start_date: date,
+    end_date: date,
+    today: date,
+    history_limit: int,
+) -> dict:
+    stats = (await db.execute(_stats_query(store_id, start_date, end_date, today))).mappings().one()
+    unique_clients = await count_unique_clients(db, start_date, end_date, store_id)
+    history = [dict(row) for row in (await db.execute(_history_query(store_id, start_date, end_date, history_limit))).mappings().all()]
+
+    rentals_count = stats["rentals_count"]
+    revenue_total = stats["revenue_total"]
+    status_counts = period_status_counts(stats)
 
     # Average check in range
     avg_check = float(revenue_total) / float(rentals_count) if rentals_count else 0.0
 
-    # Backward compatibility fields (today-only)
-    rentals_today_query = select(func.count()).select_from(Rental).where(Rental.date_start == today, Rental.is_deleted == False)
-    if store_id:
-        rentals_today_query = rentals_today_query.where(Rental.store_id == store_id)
-    rentals_today = await db.scalar(rentals_today_query) or 0
-
-    total_amount_query = select(func.sum(Rental.total_amount)).where(Rental.date_start == today, Rental.is_deleted == False)
-    if store_id:
-        total_amount_query = total_amount_query.where(Rental.store_id == store_id)
-    total_amount_today = await db.scalar(total_amount_query) or 0
-
-    # History (latest N within selected range)
-    history_base = select(Rental, User).join(User, Rental.client_id == User.id).where(Rental.is_deleted == False)
-    if store_id:
-        history_base = history_base.where(Rental.store_id == store_id)
-    history_base = history_base.where(Rental.date_start >= start_date, Rental.date_start <= end_date)
-    history_base = history_base.order_by(Rental.date_start.desc()).limit(history_limit)
-    result = await db.execute(history_base)
-    history = []
-    for r, client in result.all():
-        admin_result = await db.execute(select(User).where(User.id == r.admin_id))
-        admin = admin_result.scalar_one_or_none()
-        history.append({
-            "id": r.id,
-            "client_id": r.client_id,
-            "client_full_name": client.full_name if client else None,
-            "admin_id": r.admin_id,
-            "admin_full_name": admin.full_name if admin else None,
-            "date_start": r.date_start,
-            "date_end": r.date_end,
-            "total_amount": r.total_amount,
-            "status": r.status,
-            "comment": r.comment
-        })
-
     return {
         "equipment": {
-            "total": total_equipment,
-            "busy": busy,
-            "available": available
+            "total": stats["total_equipment"],
+            "busy": stats["busy"],
+            "available": stats["available"]
         },
         "period": {
             "start": start_date.isoformat(),
@@ -176,11 +158,67 @@ async def dashboard(
             "unique_clients": unique_clients,
             "status_counts": status_counts,
             "avg_check": avg_check,
-            "cash": cash_total,
-            "card": card_total,
+            "cash": float(stats["cash"]),
+            "card": float(stats["card"]),
         },
         # legacy today fields kept for compatibility
-        "rentals_today": rentals_today,
-        "total_amount_today": total_amount_today,
+        "rentals_today": stats["rentals_today"],
+        "total_amount_today": stats["total_amount_today"],
         "history": history
-    } 
\ No newline at end of file
+    }
+
+@router.get("/timeseries")
+async def timeseries(
+    date_from: date = Query(alias="from"),
+    date_to: date = Query(alias="to"),
+    granularity: str = Query(default="day", description="day | week | month"),
+    compare: bool = Query(default=False, description="also return the previous period of the same length"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail="granularity must be one of: day, week, month")
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="from cannot be after to")
+    if (date_to - date_from).days >= MAX_TIMESERIES_DAYS:
+        raise HTTPException(status_code=400, detail=f"Period cannot be longer than {MAX_TIMESERIES_DAYS} days")
+    store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
+    return await _cached(
+        ("timeseries", store_id, date_from, date_to, granularity, compare),
+        store_id,
+        lambda: get_timeseries(db, date_from, date_to, granularity, store_id, compare),
+    )
+
+@router.get("/utilization")
+async def utilization(
+    date_from: date = Query(alias="from"),
+    date_to: date = Query(alias="to"),
+    category_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="from cannot be after to")
+    if (date_to - date_from).days >= MAX_UTILIZATION_DAYS:
+        raise HTTPException(status_code=400, detail=f"Period cannot be longer than {MAX_UTILIZATION_DAYS} days")
+    store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
+    return await _cached(
+        ("utilization", store_id, date_from, date_to, category_id, date.today()),
+        store_id,
+        lambda: get_utilization(db, date_from, date_to, store_id, category_id),
+    )
+
+@router.get("/forecast")
+async def forecast(
+    category_id: Optional[int] = None,
+    weeks: int = Query(default=FORECAST_WEEKS, ge=1, le=FORECAST_WEEKS),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Прогноз спроса по категориям (считается фоновой задачей, здесь только чтение)"""
+    store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
+    return await _cached(
+        ("forecast", store_id, category_id, weeks, date.today()),
+        store_id,
+        lambda: get_forecast(db, store_id, category_id, weeks),
+    )
@@ -1,50 +1,110 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
+from datetime import date, timedelta
+import numpy as np
+from sqlalchemy.future import select
 from app.schemas.equipment import EquipmentCreate, EquipmentRead, EquipmentUpdate
-from app.crud.equipment import create_equipment, get_equipment, get_equipments, update_equipment, delete_equipment
-from app.db.session import get_db
+from app.crud.equipment import create_equipment, get_equipment, get_equipment_rows, update_equipment, delete_equipment
+from app.db.session import get_db, get_read_db
 from app.crud import store as store_crud
+from app.crud.availability import get_free_quantities
+from app.crud.occupancy import get_occupancy_matrix
+from app.models.equipment import Equipment
 from app.core.auth import require_role, get_current_user
 from app.schemas.user import UserRole
 from app.models.user import User
 
 router = APIRouter(prefix="/equipment", tags=["equipment"])
 
+MAX_CALENDAR_DAYS = 366
+
+equipment_list_adapter = TypeAdapter(List[EquipmentRead])
+
+def _list_response(rows: List[dict]) -> Response:
+    # Сериализуем готовые строки заранее собранной схемой, минуя повторную обработку в FastAPI
+    content = equipment_list_adapter.dump_json(equipment_list_adapter.validate_python(rows))
+    return Response(content=content, media_type="application/json")
+
 @router.post("/", response_model=EquipmentRead, dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin))])
 async def create(equipment_in: EquipmentCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     # Для store_admin устанавливаем store_id из его профиля
     if current_user.role == UserRole.store_admin:
         equipment_in.store_id = current_user.store_id
-    return await create_equipment(db, equipment_in)
+    return await create_equipment(db, equipment_in, performed_by=current_user.id)
 
 @router.get("/", response_model=List[EquipmentRead], dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
 async def read_all(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     # Для superadmin показываем все данные, для остальных только их магазин
     store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
-    equipments = await get_equipments(db, skip, limit, store_id)
-    # Добавляем category_name
-    result = []
-    for eq in equipments:
-        item = eq.__dict__.copy()
-        item['category_name'] = eq.category.name if getattr(eq, 'category', None) else None
-        result.append(item)
-    return result
+    return _list_response(await get_equipment_rows(db, skip, limit, store_id))
 
 # Публичный список техники по slug (без авторизации)
+# quantity_available — сколько единиц свободно на все даты [date_from, date_to] (по умолчанию сегодня)
 @router.get("/public", response_model=List[EquipmentRead])
-async def public_read_all(store_slug: str = None, skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
+async def public_read_all(
+    store_slug: str = None,
+    skip: int = 0,
+    limit: int = 100,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    date_from = date_from or date.today()
+    date_to = date_to or date_from
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from cannot be after date_to")
     store_id = None
     if store_slug:
         store = await store_crud.get_store_by_slug(db, store_slug)
         store_id = store.id if store else None
-    equipments = await get_equipments(db, skip, limit, store_id)
-    result = []
-    for eq in equipments:
-        item = eq.__dict__.copy()
-        item['category_name'] = eq.category.name if getattr(eq, 'category', None) else None
-        result.append(item)
-    return result
+    rows = await get_equipment_rows(db, skip, limit, store_id)
+    free = await get_free_quantities(db, {row["id"]: row["quantity_total"] for row in rows}, date_from, date_to, store_id)
+    for row in rows:
+        row["quantity_available"] = free.get(row["id"], 0)
+    return _list_response(rows)
+
+# Календарь занятости: сколько единиц каждой техники занято в каждый день периода
+@router.get("/availability", dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
+async def availability_calendar(
+    date_from: date = Query(alias="from"),
+    date_to: date = Query(alias="to"),
+    category_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="from cannot be after to")
+    if (date_to - date_from).days >= MAX_CALENDAR_DAYS:
+        raise HTTPException(status_code=400, detail=f"Period cannot be longer than {MAX_CALENDAR_DAYS} days")
+    store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
+    query = select(Equipment.id, Equipment.title, Equipment.category_id, Equipment.quantity_total).where(Equipment.is_deleted == False)
+    if store_id:
+        query = query.where(Equipment.store_id == store_id)
+    if category_id:
+        query = query.where(Equipment.category_id == category_id)
+    equipments = (await db.execute(query.order_by(Equipment.title, Equipment.id))).all()
+    matrix = await get_occupancy_matrix(db, [eq.id for eq in equipments], date_from, date_to, store_id)
+    totals = np.array([eq.quantity_total or 0 for eq in equipments], dtype=np.int64).reshape(-1, 1)
+    free = np.maximum(totals - matrix, 0)
+    days = [(date_from + timedelta(days=i)).isoformat() for i in range(matrix.shape[1])]
+    return {
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "days": days,
+        "equipment": [
+            {
+                "id": eq.id,
+                "title": eq.title,
+                "category_id": eq.category_id,
+                "quantity_total": eq.quantity_total,
+                "occupied": matrix[i].tolist(),
+                "free": free[i].tolist(),
+            }
+            for i, eq in enumerate(equipments)
+        ],
+    }
 
 @router.get("/{equipment_id}", response_model=EquipmentRead, dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
 async def read(equipment_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -61,7 +121,7 @@ async def read(equipment_id: int, db: AsyncSession = Depends(get_db), current_us
 async def update(equipment_id: int, equipment_in: EquipmentUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     # Для superadmin разрешаем редактировать все, для остальных только их магазин
     store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
-    equipment = await update_equipment(db, equipment_id, equipment_in, store_id)
+    equipment = await update_equipment(db, equipment_id, equipment_in, store_id, performed_by=current_user.id)
     if not equipment:
         raise HTTPException(status_code=404, detail="Equipment not found")
     return equipment
@@ -1,36 +1,69 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from typing import List, Optional
-from datetime import datetime, date
-from app.db.session import get_db
-from app.models.equipment_movement import EquipmentMovement
+from datetime import date
+from app.db.session import get_read_db, read_session_factory
+from app.crud.equipment_movement import get_movements as list_movements, encode_cursor, movements_export_query, EXPORT_COLUMNS
+from app.core.export import export_response, stream_batches, EXPORT_FORMATS
 from app.schemas.equipment_movement import EquipmentMovementRead
-from app.core.auth import require_role
+from app.core.auth import require_role, get_current_user
+from app.models.user import User
 from app.schemas.user import UserRole
 
 router = APIRouter(prefix="/equipment-movements", tags=["equipment-movements"], dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
 
 @router.get("/", response_model=List[EquipmentMovementRead])
 async def get_movements(
+    response: Response,
     equipment_id: Optional[int] = None,
     performed_by: Optional[int] = None,
     action: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-    db: AsyncSession = Depends(get_db)
+    store_id: Optional[int] = Query(default=None, description="только для superadmin"),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
 ):
-    query = select(EquipmentMovement)
-    if equipment_id:
-        query = query.where(EquipmentMovement.equipment_id == equipment_id)
-    if performed_by:
-        query = query.where(EquipmentMovement.performed_by == performed_by)
-    if action:
-        query = query.where(EquipmentMovement.action == action)
-    if date_from:
-        query = query.where(EquipmentMovement.timestamp >= datetime.combine(date_from, datetime.min.time()))
-    if date_to:
-        query = query.where(EquipmentMovement.timestamp <= datetime.combine(date_to, datetime.max.time()))
-    query = query.order_by(EquipmentMovement.timestamp.desc())
-    result = await db.execute(query)
-    return result.scalars().all() 
\ No newline at end of file
+    # Следующая страница запрашивается с cursor из заголовка X-Next-Cursor
+    if current_user.role != UserRole.superadmin:
+        store_id = current_user.store_id
+    try:
+        movements = await list_movements(
+            db,
+            store_id=store_id,
+            equipment_id=equipment_id,
+            performed_by=performed_by,
+            action=action,
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+            limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(movements) == limit:
+        last = movements[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.timestamp, last.id)
+    return movements
+
+@router.get("/export")
+async def export_movements(
+    request: Request,
+    format: str = Query(default="csv", description="csv | xlsx"),
+    equipment_id: Optional[int] = None,
+    performed_by: Optional[int] = None,
+    action: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    store_id: Optional[int] = Query(default=None, description="только для superadmin"),
+    current_user: User = Depends(get_current_user),
+):
+    """Выгрузка движений в CSV/XLSX с теми же фильтрами, что у списка; строки идут потоком"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or xlsx")
+    if current_user.role != UserRole.superadmin:
+        store_id = current_user.store_id
+    query = movements_export_query(store_id, equipment_id, performed_by, action, date_from, date_to)
+    return export_response(format, "equipment_movements", EXPORT_COLUMNS, stream_batches(read_session_factory(request), query))
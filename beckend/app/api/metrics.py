@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends
+from app.core.auth import require_role, principal_cache, hashing_stats
+from app.schemas.user import UserRole
+from app.db.session import engine, read_engine, pool_stats
+from app.core.dashboard_cache import dashboard_cache_stats
+from app.crud.inventory import inventory_drift_stats
+
+router = APIRouter(prefix="/metrics", tags=["metrics"], dependencies=[Depends(require_role(UserRole.superadmin))])
+
+@router.get("/")
+async def metrics():
+    """Внутренние метрики процесса для мониторинга"""
+    return {
+        "db_pool": pool_stats(engine),
+        "db_read_pool": pool_stats(read_engine) if read_engine is not engine else None,
+        "auth_cache": principal_cache.stats(),
+        "password_hashing": hashing_stats(),
+        "dashboard_cache": dashboard_cache_stats(),
+        # Последняя сверка остатков в этом процессе (задачу выполняет только воркер-лидер планировщика)
+        "inventory_drift": inventory_drift_stats(),
+    }
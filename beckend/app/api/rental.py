@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from app.schemas.rental import RentalCreate, RentalRead
-from app.crud.rental import create_rental, get_rental, get_rentals, delete_rental, return_rental, mark_overdue_rentals, activate_booking
-from app.db.session import get_db
+from typing import List, Optional
+from app.schemas.rental import RentalCreate, RentalRead, RentalFilter, RentalPaymentCreate, RentalPaymentRead
+from app.crud.rental import create_rental, get_rental, get_rentals, count_rentals, encode_cursor, delete_rental, return_rental, activate_booking, add_payment, get_payments, rentals_export_query, EXPORT_COLUMNS
+from app.db.session import get_db, get_read_db, read_session_factory, engine
+from app.core.export import export_response, stream_batches, EXPORT_FORMATS
 from app.core.auth import require_role, get_current_user
 from app.schemas.user import UserRole
 from app.models.user import User
@@ -23,10 +24,41 @@ async def create(rental_in: RentalCreate, db: AsyncSession = Depends(get_db), cu
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/", response_model=List[RentalRead], dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
-async def read_all(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
-    await mark_overdue_rentals(db)
+async def read_all(
+    skip: int = 0,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    filters: RentalFilter = Depends(),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    # Следующая страница запрашивается с cursor из заголовка X-Next-Cursor
     store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
-    return await get_rentals(db, skip, limit, store_id)
+    try:
+        rentals = await get_rentals(db, skip, limit, store_id, filters=filters, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Total-Count": str(await count_rentals(db, store_id, filters))}
+    if len(rentals) == limit:
+        last = rentals[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last.date_start, last.id)
+    # JSON каждой аренды уже собран базой по полям RentalRead, остаётся склеить массив
+    content = ("[" + ",".join(row.json for row in rentals) + "]").encode("utf-8")
+    return Response(content=content, media_type="application/json", headers=headers)
+
+@router.get("/export", dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
+async def export(
+    request: Request,
+    format: str = Query(default="csv", description="csv | xlsx"),
+    filters: RentalFilter = Depends(),
+    current_user: User = Depends(get_current_user),
+):
+    """Выгрузка аренд в CSV/XLSX с теми же фильтрами, что у списка; строки идут потоком"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="format must be csv or xlsx")
+    store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
+    query = rentals_export_query(engine.dialect.name, store_id, filters)
+    return export_response(format, "rentals", EXPORT_COLUMNS, stream_batches(read_session_factory(request), query))
 
 @router.get("/{rental_id}", response_model=RentalRead, dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
 async def read(rental_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -39,7 +71,7 @@ async def read(rental_id: int, db: AsyncSession = Depends(get_db), current_user:
 @router.delete("/{rental_id}", dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin))])
 async def delete(rental_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
-    success = await delete_rental(db, rental_id, store_id)
+    success = await delete_rental(db, rental_id, store_id, performed_by=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Rental not found")
     return {"ok": True}
@@ -55,14 +87,27 @@ async def return_equipment(rental_id: int, payload: ReturnPayload | None = None,
     store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
     cash = float(payload.cash) if payload and payload.cash is not None else 0.0
     card = float(payload.card) if payload and payload.card is not None else 0.0
-    success = await return_rental(db, rental_id, store_id, cash=cash, card=card)
+    success = await return_rental(db, rental_id, store_id, cash=cash, card=card, taken_by=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Rental not found or not active")
     return {"ok": True}
 
+@router.get("/{rental_id}/payments", response_model=List[RentalPaymentRead], dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
+async def read_payments(rental_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
+    return await get_payments(db, rental_id, store_id)
+
+@router.post("/{rental_id}/payments", response_model=RentalPaymentRead, dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff))])
+async def create_payment(rental_id: int, payment_in: RentalPaymentCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
+    try:
+        return await add_payment(db, rental_id, payment_in.method, payment_in.amount, taken_by=current_user.id, store_id=store_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/overdue", response_model=List[RentalRead], dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff, UserRole.viewer))])
 async def overdue(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
-    await mark_overdue_rentals(db)
+    # Статус overdue проставляет фоновый планировщик (app/core/scheduler.py)
     store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
     query = select(Rental).where(Rental.status == "overdue", Rental.is_deleted == False)
     if store_id:
@@ -73,7 +118,7 @@ async def overdue(db: AsyncSession = Depends(get_db), current_user: User = Depen
 @router.patch("/{rental_id}/activate", dependencies=[Depends(require_role(UserRole.store_admin, UserRole.superadmin, UserRole.staff))])
 async def activate(rental_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     store_id = None if current_user.role == UserRole.superadmin else current_user.store_id
-    success = await activate_booking(db, rental_id, store_id)
+    success = await activate_booking(db, rental_id, store_id, performed_by=current_user.id)
     if not success:
         raise HTTPException(status_code=400, detail="Cannot activate booking (not found, not booked, or not enough equipment)")
     return {"ok": True}
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
+from datetime import date
 from app.crud import store as store_crud
-from app.schemas.store import StoreCreate, StoreRead, StoreUpdate
+from app.schemas.store import StoreCreate, StoreRead, StoreUpdate, StoreOverview
 from app.schemas.user import UserRead
 from app.core.deps import get_db, get_current_user
+from app.db.session import get_read_db
 
 router = APIRouter(prefix="/stores", tags=["stores"])
 
@@ -40,6 +42,50 @@ async def read_active_stores(
     stores = await store_crud.get_active_stores(db)
     return stores
 
+@router.get("/overview", response_model=List[StoreOverview])
+async def stores_overview(
+    response: Response,
+    date_from: Optional[date] = Query(default=None, description="YYYY-MM-DD, по умолчанию сегодня"),
+    date_to: Optional[date] = Query(default=None, description="YYYY-MM-DD, по умолчанию сегодня"),
+    skip: int = Query(default=0, ge=0),
+    limit: int = Query(default=100, ge=1, le=1000),
+    sort: str = Query(default="name", description=", ".join(store_crud.OVERVIEW_SORT_FIELDS)),
+    order: str = Query(default="asc", description="asc | desc"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: UserRead = Depends(get_current_user)
+):
+    """
+    Сводка по всем магазинам сети одним запросом: сотрудники, техника,
+    активные и просроченные аренды, число аренд и выручка за период.
+    Общее число магазинов — в заголовке X-Total-Count.
+    Доступно только для superadmin.
+    """
+    if current_user.role != "superadmin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав для просмотра сводки магазинов"
+        )
+    if sort not in store_crud.OVERVIEW_SORT_FIELDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Сортировка возможна по полям: {', '.join(store_crud.OVERVIEW_SORT_FIELDS)}"
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="order: asc или desc")
+    date_from = date_from or date.today()
+    date_to = date_to or date.today()
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from не может быть позже date_to"
+        )
+
+    stores, total = await store_crud.get_stores_overview(
+        db, date_from, date_to, skip=skip, limit=limit, sort=sort, descending=order == "desc"
+    )
+    response.headers["X-Total-Count"] = str(total)
+    return stores
+
 @router.get("/{store_id}", response_model=StoreRead)
 async def read_store(
     store_id: int,
@@ -145,13 +191,26 @@ async def delete_store(
 @router.get("/{store_id}/stats")
 async def get_store_stats(
     store_id: int,
+    date_from: Optional[date] = Query(default=None, description="YYYY-MM-DD"),
+    date_to: Optional[date] = Query(default=None, description="YYYY-MM-DD"),
     db: AsyncSession = Depends(get_db),
     current_user: UserRead = Depends(get_current_user)
 ):
     """
     Получить статистику магазина.
+    С date_from и date_to добавляется сводка за период (аренды, выручка, оплаты, клиенты).
     Доступно для всех авторизованных пользователей.
     """
+    if (date_from is None) != (date_to is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Нужно указать и date_from, и date_to"
+        )
+    if date_from and date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from не может быть позже date_to"
+        )
     # Проверяем, что магазин существует
     store = await store_crud.get_store(db, store_id=store_id)
     if store is None:
@@ -160,5 +219,5 @@ async def get_store_stats(
             detail="Магазин не найден"
         )
     
-    stats = await store_crud.get_store_stats(db, store_id=store_id)
+    stats = await store_crud.get_store_stats(db, store_id=store_id, date_from=date_from, date_to=date_to)
     return stats 
\ No newline at end of file
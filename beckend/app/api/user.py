@@ -2,10 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from typing import List
-from app.schemas.user import UserCreate, UserRead, UserUpdate
+from app.schemas.user import UserCreate, UserRead, UserUpdate, Principal
 from app.crud.user import create_user, get_user, get_users, update_user, delete_user_by_id
 from app.db.session import get_db
-from app.core.auth import require_role, get_current_user
+from app.core.auth import require_role, get_current_user, get_user_by_id
 from app.models.user import UserRole, User
 from app.models.store import Store
 
@@ -82,7 +82,10 @@ async def update(user_id: int, user_in: UserUpdate, db: AsyncSession = Depends(g
     return user
 
 @router.get("/me", response_model=UserRead)
-async def get_me(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def get_me(principal: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    current_user = await get_user_by_id(db, principal.id)
+    if current_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
     store_name = None
     if current_user.store_id is not None:
         try:
@@ -99,7 +102,10 @@ async def get_me(current_user: User = Depends(get_current_user), db: AsyncSessio
     )
 
 @router.get("/auth/me", response_model=UserRead)
-async def auth_me(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def auth_me(principal: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    current_user = await get_user_by_id(db, principal.id)
+    if current_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
     store_name = None
     if current_user.store_id is not None:
         try:
@@ -1,3 +1,6 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -7,7 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.db.session import get_db
 from app.models.user import User, UserRole
-from app.schemas.user import TokenData
+from app.schemas.user import TokenData, Principal
+from app.core.cache import TTLCache
 from passlib.context import CryptContext
 import os
 from dotenv import load_dotenv
@@ -19,23 +23,84 @@ print('ALGORITHM:', os.getenv('ALGORITHM'))
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+AUTH_CACHE_MAX_SIZE = int(os.getenv("AUTH_CACHE_MAX_SIZE", 4096))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+PASSWORD_HASH_NICE = int(os.getenv("PASSWORD_HASH_NICE", 10))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Кэш аутентифицированных пользователей: (user_id, iat) -> Principal
+principal_cache = TTLCache(maxsize=AUTH_CACHE_MAX_SIZE, ttl=AUTH_CACHE_TTL_SECONDS)
+
+def invalidate_principal(user_id: int) -> None:
+    """Сбрасывает закэшированные данные пользователя после его изменения или удаления"""
+    principal_cache.invalidate_where(lambda key: key[0] == user_id)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
+# bcrypt занимает ~200мс CPU, поэтому хэширование выполняется в отдельном пуле,
+# чтобы не блокировать event loop. Очередь ограничена, лишние запросы получают 503.
+def _lower_hash_thread_priority():
+    # На машинах с 1-2 ядрами потоки bcrypt иначе на равных делят CPU с потоком event loop,
+    # и задержка остальных эндпоинтов растёт; в Linux nice действует на отдельный поток
+    if PASSWORD_HASH_NICE and hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PASSWORD_HASH_NICE)
+        except OSError:
+            pass
+
+_hash_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash",
+    initializer=_lower_hash_thread_priority,
+)
+_hash_pending = 0
+_hash_rejected = 0
+
+async def _run_hashing(func, *args):
+    global _hash_pending, _hash_rejected
+    if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        _hash_rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, try again later"
+        )
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_hash_executor, func, *args)
+    finally:
+        _hash_pending -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing(get_password_hash, password)
+
+def hashing_stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+        "pending": _hash_pending,
+        "rejected": _hash_rejected,
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=1440)
-    to_encode.update({"exp": expire})
+        expire = now + timedelta(minutes=1440)
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -53,17 +118,24 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
         token_data = TokenData(user_id=user_id)
     except JWTError:
         raise credentials_exception
+    # Старые токены без iat кэшируем по времени истечения
+    cache_key = (int(token_data.user_id), payload.get("iat") or payload.get("exp"))
+    principal = principal_cache.get(cache_key)
+    if principal is not None:
+        return principal
     user = await get_user_by_id(db, int(token_data.user_id))
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal.model_validate(user)
+    principal_cache.set(cache_key, principal)
+    return principal
 
 async def get_user_by_id(db: AsyncSession, user_id: int):
     result = await db.execute(select(User).where(User.id == user_id))
     return result.scalar_one_or_none()
 
 def require_role(*allowed_roles: UserRole):
-    def role_checker(current_user: User = Depends(get_current_user)):
+    def role_checker(current_user: Principal = Depends(get_current_user)):
         if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,46 @@
+import os
+import threading
+from typing import Iterable, Optional
+from app.core.cache import TTLCache, SingleFlight
+
+# Ответы дашборда кэшируются в памяти процесса. Запись в своём процессе сбрасывает кэш сразу
+# (через версию магазина), изменения из других воркеров видны не позже чем через TTL.
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", 30))
+DASHBOARD_CACHE_MAX_SIZE = int(os.getenv("DASHBOARD_CACHE_MAX_SIZE", 1024))
+
+dashboard_cache = TTLCache(maxsize=DASHBOARD_CACHE_MAX_SIZE, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+dashboard_single_flight = SingleFlight()
+
+_versions_lock = threading.Lock()
+_store_versions: dict = {}
+# Версия для сводки по всем магазинам (superadmin) растёт при любой записи
+_global_version = 0
+
+
+def store_version(store_id: Optional[int]) -> int:
+    """Текущая версия данных магазина (или всех магазинов для store_id=None)"""
+    with _versions_lock:
+        if store_id is None:
+            return _global_version
+        return _store_versions.get(store_id, 0)
+
+
+def bump_store_versions(store_ids: Iterable[Optional[int]]) -> None:
+    """Отмечает, что данные магазинов изменились; старые ключи кэша больше не используются"""
+    global _global_version
+    with _versions_lock:
+        for store_id in store_ids:
+            if store_id is not None:
+                _store_versions[store_id] = _store_versions.get(store_id, 0) + 1
+        _global_version += 1
+
+
+def bump_store_version(store_id: Optional[int]) -> None:
+    bump_store_versions([store_id])
+
+
+def dashboard_cache_stats() -> dict:
+    return {
+        **dashboard_cache.stats(),
+        **dashboard_single_flight.stats(),
+    }
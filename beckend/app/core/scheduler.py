@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from app.db.session import engine, AsyncSessionLocal
+from app.crud.rental import mark_overdue_rentals
+from app.crud.client_metrics import run_client_metrics
+from app.crud.forecast import run_demand_forecast
+from app.crud.stock import checkpoint_stock
+from app.crud.equipment_movement import ensure_movement_partitions
+from app.crud.inventory import reconcile_inventory
+
+logger = logging.getLogger("app.scheduler")
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+# Как часто проверять просроченные аренды; кроме того, проверка всегда выполняется в полночь
+OVERDUE_CHECK_INTERVAL_SECONDS = int(os.getenv("OVERDUE_CHECK_INTERVAL_SECONDS", 600))
+# Как часто пересчитывать RFM-показатели клиентов
+CLIENT_METRICS_INTERVAL_SECONDS = int(os.getenv("CLIENT_METRICS_INTERVAL_SECONDS", 3600))
+# Как часто пересчитывать прогноз спроса по категориям
+DEMAND_FORECAST_INTERVAL_SECONDS = int(os.getenv("DEMAND_FORECAST_INTERVAL_SECONDS", 6 * 3600))
+# Как часто записывать контрольные точки остатков по журналу движений
+STOCK_CHECKPOINT_INTERVAL_SECONDS = int(os.getenv("STOCK_CHECKPOINT_INTERVAL_SECONDS", 24 * 3600))
+# Сверка остатков техники; по умолчанию только отчёт в лог и /metrics, без исправления
+INVENTORY_RECONCILE_INTERVAL_SECONDS = int(os.getenv("INVENTORY_RECONCILE_INTERVAL_SECONDS", 3600))
+INVENTORY_RECONCILE_FIX = os.getenv("INVENTORY_RECONCILE_FIX", "false").strip().lower() in ("1", "true", "yes", "on")
+# Проверка месячных секций журнала движений (создаются заранее на несколько месяцев)
+MOVEMENT_PARTITIONS_INTERVAL_SECONDS = int(os.getenv("MOVEMENT_PARTITIONS_INTERVAL_SECONDS", 24 * 3600))
+# Ключ advisory-lock в PostgreSQL: задачи выполняет только один воркер
+SCHEDULER_LOCK_KEY = int(os.getenv("SCHEDULER_LOCK_KEY", 814_700_001))
+
+
+def _seconds_until_next_run() -> float:
+    now = datetime.now()
+    next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    # Небольшой запас, чтобы date.today() уже вернул новый день
+    until_midnight = (next_midnight - now).total_seconds() + 1
+    return min(OVERDUE_CHECK_INTERVAL_SECONDS, until_midnight)
+
+
+async def run_overdue_job() -> None:
+    async with AsyncSessionLocal() as session:
+        updated = await mark_overdue_rentals(session)
+    if updated:
+        logger.info("Marked %d rentals as overdue", updated)
+
+
+async def run_client_metrics_job() -> None:
+    async with AsyncSessionLocal() as session:
+        scored = await run_client_metrics(session)
+    logger.info("Client metrics refreshed for %d clients", scored)
+
+
+async def run_demand_forecast_job() -> None:
+    async with AsyncSessionLocal() as session:
+        categories = await run_demand_forecast(session)
+    logger.info("Demand forecast refreshed for %d categories", categories)
+
+
+async def run_stock_checkpoint_job() -> None:
+    async with AsyncSessionLocal() as session:
+        snapshots = await checkpoint_stock(session)
+    if snapshots:
+        logger.info("Stock checkpoint written for %d equipment", snapshots)
+
+
+async def run_inventory_reconcile_job() -> None:
+    async with AsyncSessionLocal() as session:
+        report = await reconcile_inventory(session, fix=INVENTORY_RECONCILE_FIX)
+    if report["drifted"] or report["ledger_drifted"]:
+        logger.warning(
+            "Inventory drift: column %d of %d equipment (%d units), ledger %d (%d units)%s",
+            report["drifted"],
+            report["equipment_checked"],
+            report["total_abs_drift"],
+            report["ledger_drifted"],
+            report["total_abs_ledger_drift"],
+            " (fixed)" if report["fixed"] else "",
+        )
+
+
+async def run_movement_partitions_job() -> None:
+    async with AsyncSessionLocal() as session:
+        created = await ensure_movement_partitions(session)
+    for name in created:
+        logger.info("Created partition %s", name)
+
+
+# Периодические задачи: (имя, функция, интервал в секундах). Выполняются в цикле планировщика,
+# когда с прошлого запуска прошло не меньше интервала
+PERIODIC_JOBS = [
+    ("client_metrics", run_client_metrics_job, CLIENT_METRICS_INTERVAL_SECONDS),
+    ("demand_forecast", run_demand_forecast_job, DEMAND_FORECAST_INTERVAL_SECONDS),
+    ("stock_checkpoint", run_stock_checkpoint_job, STOCK_CHECKPOINT_INTERVAL_SECONDS),
+    ("inventory_reconcile", run_inventory_reconcile_job, INVENTORY_RECONCILE_INTERVAL_SECONDS),
+    ("movement_partitions", run_movement_partitions_job, MOVEMENT_PARTITIONS_INTERVAL_SECONDS),
+]
+
+
+async def _run_periodic_jobs(last_runs: dict) -> None:
+    for name, job, interval in PERIODIC_JOBS:
+        now = time.monotonic()
+        if name in last_runs and now - last_runs[name] < interval:
+            continue
+        last_runs[name] = now
+        # Ошибка одной задачи не должна останавливать остальные
+        try:
+            await job()
+        except Exception:
+            logger.exception("Scheduler job %s failed", name)
+
+
+async def _try_acquire_leader_lock(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        # Без PostgreSQL (локальная разработка) считаем, что воркер один
+        return True
+    result = await conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": SCHEDULER_LOCK_KEY})
+    acquired = bool(result.scalar())
+    # Блокировка сессионная, транзакция нам не нужна
+    await conn.commit()
+    return acquired
+
+
+async def _holds_leader_lock(conn) -> bool:
+    """Проверяет по pg_locks, что блокировка всё ещё у этого соединения.
+
+    Если соединение оборвалось (перезапуск сервера, pgbouncer, idle-таймаут), PostgreSQL снял
+    блокировку и её мог забрать другой воркер; запрос тогда падает или возвращает false.
+    """
+    if conn.dialect.name != "postgresql":
+        return True
+    result = await conn.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND pid = pg_backend_pid() "
+            "AND classid = :classid AND objid = :objid AND objsubid = 1 AND granted)"
+        ),
+        # bigint-ключ хранится в pg_locks двумя половинами
+        {"classid": SCHEDULER_LOCK_KEY >> 32, "objid": SCHEDULER_LOCK_KEY & 0xFFFFFFFF},
+    )
+    held = bool(result.scalar())
+    await conn.commit()
+    return held
+
+
+async def _scheduler_loop() -> None:
+    # Блокировку держит отдельное соединение вне пула приложения: оно не занимает место
+    # в пуле запросов, и пул не подменит его при recycle или pre_ping
+    lock_engine = create_async_engine(engine.url, poolclass=NullPool)
+    try:
+        while True:
+            try:
+                async with lock_engine.connect() as conn:
+                    if not await _try_acquire_leader_lock(conn):
+                        await asyncio.sleep(OVERDUE_CHECK_INTERVAL_SECONDS)
+                        continue
+                    logger.info("Scheduler leader lock acquired")
+                    last_runs: dict = {}
+                    # Перед каждым проходом убеждаемся, что всё ещё лидер
+                    while await _holds_leader_lock(conn):
+                        await run_overdue_job()
+                        await _run_periodic_jobs(last_runs)
+                        await asyncio.sleep(_seconds_until_next_run())
+                    logger.warning("Scheduler leader lock lost, stepping down")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Scheduler iteration failed")
+                await asyncio.sleep(OVERDUE_CHECK_INTERVAL_SECONDS)
+    finally:
+        await lock_engine.dispose()
+
+
+async def run_startup_jobs() -> None:
+    """Задачи при старте процесса, в том числе при SCHEDULER_ENABLED=false"""
+    # Без секций на текущий месяц новые движения копятся в секции по умолчанию
+    try:
+        await run_movement_partitions_job()
+    except Exception:
+        logger.exception("Startup job movement_partitions failed")
+
+
+def start_scheduler() -> asyncio.Task | None:
+    if not SCHEDULER_ENABLED:
+        return None
+    return asyncio.create_task(_scheduler_loop(), name="scheduler")
+
+
+async def stop_scheduler(task: asyncio.Task | None) -> None:
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
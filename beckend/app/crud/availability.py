@@ -0,0 +1,137 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import or_
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.models.rental import Rental, RentalStatus, RentalItem
+from app.models.equipment import Equipment
+
+# Статусы аренды, которые занимают технику на свои даты
+OCCUPYING_STATUSES = (RentalStatus.booked, RentalStatus.active, RentalStatus.overdue)
+# Выданная техника занята до фактического возврата, даже если дата окончания прошла
+ISSUED_STATUSES = (RentalStatus.active, RentalStatus.overdue)
+
+Interval = Tuple[date, date, int]
+
+
+async def load_intervals(
+    db: AsyncSession,
+    date_from: date,
+    date_to: date,
+    equipment_ids: Optional[Iterable[int]] = None,
+    store_id: int = None,
+    exclude_rental_id: int = None,
+) -> Dict[int, List[Interval]]:
+    """Загружает одним запросом интервалы занятости (start, end, quantity) по каждой технике.
+
+    Даты включительные. Для выданной техники конец интервала продлевается до сегодняшнего дня.
+    """
+    today = date.today()
+    query = (
+        select(RentalItem.equipment_id, Rental.date_start, Rental.date_end, Rental.status, RentalItem.quantity)
+        .join(Rental, Rental.id == RentalItem.rental_id)
+        .where(
+            Rental.is_deleted == False,
+            RentalItem.is_deleted == False,
+            Rental.status.in_(OCCUPYING_STATUSES),
+            Rental.date_start <= date_to,
+            or_(Rental.date_end >= date_from, Rental.status.in_(ISSUED_STATUSES)),
+        )
+    )
+    if equipment_ids is not None:
+        query = query.where(RentalItem.equipment_id.in_(list(equipment_ids)))
+    if store_id:
+        query = query.where(Rental.store_id == store_id)
+    if exclude_rental_id:
+        query = query.where(Rental.id != exclude_rental_id)
+
+    intervals: Dict[int, List[Interval]] = {}
+    for equipment_id, start, end, status, quantity in (await db.execute(query)).all():
+        if status in ISSUED_STATUSES and end < today:
+            end = today
+        intervals.setdefault(equipment_id, []).append((start, end, quantity or 0))
+    return intervals
+
+
+def max_occupied(intervals: List[Interval], date_from: date, date_to: date) -> int:
+    """Максимальное число единиц, занятых одновременно в [date_from, date_to] (sweep-line)"""
+    range_start = date_from.toordinal()
+    range_end = date_to.toordinal()
+    deltas: Dict[int, int] = {}
+    for start, end, quantity in intervals:
+        start = max(start.toordinal(), range_start)
+        end = min(end.toordinal(), range_end)
+        if start > end or quantity <= 0:
+            continue
+        deltas[start] = deltas.get(start, 0) + quantity
+        deltas[end + 1] = deltas.get(end + 1, 0) - quantity
+
+    occupied = 0
+    peak = 0
+    for day in sorted(deltas):
+        occupied += deltas[day]
+        if occupied > peak:
+            peak = occupied
+    return peak
+
+
+async def get_free_quantities(
+    db: AsyncSession,
+    totals: Dict[int, int],
+    date_from: date,
+    date_to: date,
+    store_id: int = None,
+    exclude_rental_id: int = None,
+) -> Dict[int, int]:
+    """Минимальное свободное количество на всём диапазоне дат для каждой техники из totals"""
+    if not totals:
+        return {}
+    # Для больших наборов дешевле отфильтровать по магазину, чем передавать тысячи id
+    equipment_ids = None if store_id and len(totals) > 500 else list(totals)
+    intervals = await load_intervals(db, date_from, date_to, equipment_ids, store_id, exclude_rental_id)
+    return {
+        equipment_id: max(0, (total or 0) - max_occupied(intervals.get(equipment_id, []), date_from, date_to))
+        for equipment_id, total in totals.items()
+    }
+
+
+async def check_availability(
+    db: AsyncSession,
+    quantities: Dict[int, int],
+    date_from: date,
+    date_to: date,
+    store_id: int = None,
+    exclude_rental_id: int = None,
+) -> None:
+    """Проверяет, что запрошенное количество свободно на все даты, иначе ValueError.
+
+    Строки техники блокируются (SELECT ... FOR UPDATE) до конца транзакции, чтобы
+    параллельные брони одной и той же техники проверялись последовательно.
+    """
+    query = (
+        select(Equipment.id, Equipment.title, Equipment.quantity_total)
+        .where(Equipment.id.in_(list(quantities)), Equipment.is_deleted == False)
+        .order_by(Equipment.id)
+        .with_for_update()
+    )
+    if store_id:
+        query = query.where(Equipment.store_id == store_id)
+    rows = {row.id: row for row in (await db.execute(query)).all()}
+    if len(rows) != len(quantities):
+        await db.rollback()
+        raise ValueError("Техника не найдена")
+
+    free = await get_free_quantities(
+        db,
+        {equipment_id: row.quantity_total for equipment_id, row in rows.items()},
+        date_from,
+        date_to,
+        exclude_rental_id=exclude_rental_id,
+    )
+    for equipment_id, requested in quantities.items():
+        if free[equipment_id] < requested:
+            await db.rollback()
+            raise ValueError(
+                f"Недостаточно техники {rows[equipment_id].title} на выбранные даты "
+                f"(доступно: {free[equipment_id]}, запрошено: {requested})"
+            )
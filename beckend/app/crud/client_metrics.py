@@ -0,0 +1,235 @@
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import and_, case, delete, func, insert, or_, update
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+from app.models.client_metrics import ClientMetrics
+from app.models.rental import Rental, RentalStatus
+from app.models.user import User
+
+# Сегменты клиентов по RFM-оценкам
+SEGMENTS = ("new", "champions", "loyal", "at_risk", "lapsing", "regular")
+# Поля, по которым можно сортировать аналитику клиентов
+ANALYTICS_SORT_FIELDS = (
+    "rfm", "monetary", "rentals", "avg_check", "last_rental", "first_rental",
+    "avg_rental_days", "overdue_rate",
+)
+# Клиент считается новым, если у него одна аренда не старше стольких дней
+NEW_CLIENT_DAYS = 30
+# Запас при поиске изменённых аренд: updated_at ставится временем начала транзакции,
+# поэтому транзакция, начатая до прошлого запуска и закоммиченная после, не потеряется
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+
+def _rental_days(dialect: str):
+    """Длительность аренды в днях (даты включительные)"""
+    if dialect == "postgresql":
+        return Rental.date_end - Rental.date_start + 1
+    return func.julianday(Rental.date_end) - func.julianday(Rental.date_start) + 1
+
+
+def _overdue_condition(today: date):
+    # Даты фактического возврата нет, поэтому для завершённых аренд ориентируемся на момент
+    # последнего изменения записи (возврат переводит аренду в completed)
+    return or_(
+        Rental.status == RentalStatus.overdue,
+        and_(Rental.status == RentalStatus.active, Rental.date_end < today),
+        and_(Rental.status == RentalStatus.completed, func.date(Rental.updated_at) > Rental.date_end),
+    )
+
+
+async def refresh_client_metrics(
+    db: AsyncSession,
+    client_ids: Optional[Iterable[int]] = None,
+    computed_at: Optional[datetime] = None,
+) -> None:
+    """Пересчитывает сырые показатели клиентов (всех, если client_ids не передан) одним сгруппированным запросом"""
+    if client_ids is not None:
+        client_ids = sorted(set(client_ids))
+        if not client_ids:
+            return
+    computed_at = computed_at or datetime.now(timezone.utc)
+    dialect = db.get_bind().dialect.name
+    query = (
+        select(
+            Rental.client_id,
+            User.store_id,
+            func.count().label("rentals"),
+            func.coalesce(func.sum(Rental.total_amount), 0).label("monetary"),
+            func.min(Rental.date_start).label("first_rental"),
+            func.max(Rental.date_start).label("last_rental"),
+            func.avg(_rental_days(dialect)).label("avg_rental_days"),
+            func.count(case((_overdue_condition(date.today()), 1))).label("overdue_rentals"),
+        )
+        .join(User, User.id == Rental.client_id)
+        .where(Rental.is_deleted == False, Rental.status != RentalStatus.cancelled)
+        .group_by(Rental.client_id, User.store_id)
+    )
+    if client_ids is not None:
+        query = query.where(Rental.client_id.in_(client_ids))
+    rows = [
+        {
+            "client_id": row.client_id,
+            "store_id": row.store_id,
+            "rentals": row.rentals,
+            "monetary": float(row.monetary),
+            "avg_check": float(row.monetary) / row.rentals,
+            "first_rental": row.first_rental,
+            "last_rental": row.last_rental,
+            "avg_rental_days": float(row.avg_rental_days or 0),
+            "overdue_rentals": row.overdue_rentals,
+            "overdue_rate": row.overdue_rentals / row.rentals,
+            "computed_at": computed_at,
+        }
+        for row in (await db.execute(query)).all()
+    ]
+
+    delete_query = delete(ClientMetrics)
+    if client_ids is not None:
+        delete_query = delete_query.where(ClientMetrics.client_id.in_(client_ids))
+    await db.execute(delete_query)
+    if rows:
+        await db.execute(insert(ClientMetrics), rows)
+
+
+def quintile_scores(values: np.ndarray) -> np.ndarray:
+    """Оценка 1..5 по квинтилю значения внутри выборки (одинаковые значения — одинаковая оценка по среднему рангу)"""
+    if not len(values):
+        return np.zeros(0, dtype=np.int64)
+    ordered = np.sort(values)
+    percentile = (np.searchsorted(ordered, values, side="left") + np.searchsorted(ordered, values, side="right")) / (2 * len(values))
+    return np.clip(np.ceil(percentile * 5), 1, 5).astype(np.int64)
+
+
+def segment_clients(r: np.ndarray, f: np.ndarray, rentals: np.ndarray, recency: np.ndarray) -> np.ndarray:
+    return np.select(
+        [
+            (rentals == 1) & (recency <= NEW_CLIENT_DAYS),
+            (r >= 4) & (f >= 4),
+            (f >= 4) & (r >= 3),
+            (r <= 2) & (f >= 3),
+            r <= 2,
+        ],
+        ["new", "champions", "loyal", "at_risk", "lapsing"],
+        default="regular",
+    )
+
+
+async def score_client_metrics(db: AsyncSession, today: Optional[date] = None) -> int:
+    """Пересчитывает RFM-оценки и сегменты по таблице client_metrics (квинтили внутри каждого магазина)"""
+    today = today or date.today()
+    rows = (await db.execute(
+        select(ClientMetrics.client_id, ClientMetrics.store_id, ClientMetrics.rentals, ClientMetrics.monetary, ClientMetrics.last_rental)
+    )).all()
+    if not rows:
+        return 0
+    client_ids = np.array([row.client_id for row in rows], dtype=np.int64)
+    stores = np.array([row.store_id or 0 for row in rows], dtype=np.int64)
+    rentals = np.array([row.rentals for row in rows], dtype=np.int64)
+    monetary = np.array([row.monetary for row in rows], dtype=np.float64)
+    recency = np.maximum(
+        today.toordinal() - np.array([row.last_rental.toordinal() for row in rows], dtype=np.int64), 0
+    )
+
+    r = np.zeros(len(rows), dtype=np.int64)
+    f = np.zeros(len(rows), dtype=np.int64)
+    m = np.zeros(len(rows), dtype=np.int64)
+    for store_id in np.unique(stores):
+        mask = stores == store_id
+        # Чем меньше дней с последней аренды, тем выше оценка R
+        r[mask] = quintile_scores(-recency[mask])
+        f[mask] = quintile_scores(rentals[mask])
+        m[mask] = quintile_scores(monetary[mask])
+    segments = segment_clients(r, f, rentals, recency)
+    rfm = r * 100 + f * 10 + m
+
+    await db.execute(
+        update(ClientMetrics),
+        [
+            {
+                "client_id": int(client_ids[i]),
+                "r_score": int(r[i]),
+                "f_score": int(f[i]),
+                "m_score": int(m[i]),
+                "rfm": int(rfm[i]),
+                "segment": str(segments[i]),
+            }
+            for i in range(len(rows))
+        ],
+    )
+    return len(rows)
+
+
+async def run_client_metrics(db: AsyncSession) -> int:
+    """Инкрементальное обновление: пересчёт клиентов с изменёнными с прошлого запуска арендами и переоценка всех"""
+    started_at = datetime.now(timezone.utc)
+    watermark = await db.scalar(select(func.max(ClientMetrics.computed_at)))
+    if watermark is None:
+        await refresh_client_metrics(db, computed_at=started_at)
+    else:
+        # Удалённые аренды тоже учитываем: после удаления показатели клиента меняются
+        since = watermark - WATERMARK_OVERLAP
+        changed = (await db.execute(
+            select(Rental.client_id)
+            .where(or_(Rental.updated_at >= since, Rental.created_at >= since))
+            .distinct()
+        )).scalars().all()
+        await refresh_client_metrics(db, changed, computed_at=started_at)
+    scored = await score_client_metrics(db)
+    await db.commit()
+    return scored
+
+
+async def get_client_analytics(
+    db: AsyncSession,
+    store_id: int = None,
+    segment: str = None,
+    sort: str = "rfm",
+    descending: bool = True,
+    skip: int = 0,
+    limit: int = 100,
+) -> Tuple[List[dict], int]:
+    sort_column = getattr(ClientMetrics, sort)
+    query = (
+        select(
+            ClientMetrics.client_id,
+            User.full_name,
+            User.phone,
+            ClientMetrics.store_id,
+            ClientMetrics.rentals,
+            ClientMetrics.monetary,
+            ClientMetrics.avg_check,
+            ClientMetrics.first_rental,
+            ClientMetrics.last_rental,
+            ClientMetrics.avg_rental_days,
+            ClientMetrics.overdue_rentals,
+            ClientMetrics.overdue_rate,
+            ClientMetrics.r_score,
+            ClientMetrics.f_score,
+            ClientMetrics.m_score,
+            ClientMetrics.rfm,
+            ClientMetrics.segment,
+            ClientMetrics.computed_at,
+            func.count().over().label("total"),
+        )
+        .join(User, User.id == ClientMetrics.client_id)
+        .order_by(sort_column.desc() if descending else sort_column.asc(), ClientMetrics.client_id)
+        .offset(skip)
+        .limit(limit)
+    )
+    if store_id:
+        query = query.where(ClientMetrics.store_id == store_id)
+    if segment:
+        query = query.where(ClientMetrics.segment == segment)
+    rows = (await db.execute(query)).mappings().all()
+    if rows:
+        total = rows[0]["total"]
+    else:
+        count_query = select(func.count()).select_from(ClientMetrics)
+        if store_id:
+            count_query = count_query.where(ClientMetrics.store_id == store_id)
+        if segment:
+            count_query = count_query.where(ClientMetrics.segment == segment)
+        total = await db.scalar(count_query)
+    return [{key: value for key, value in row.items() if key != "total"} for row in rows], total
@@ -1,14 +1,22 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.equipment import Equipment
+from app.models.category import Category
 from app.schemas.equipment import EquipmentCreate, EquipmentUpdate
 from typing import List, Optional
 from sqlalchemy.orm import joinedload
+from app.core.dashboard_cache import bump_store_version
+from app.crud.stock import record_movements
+from app.models.equipment_movement import MovementAction
 
-async def create_equipment(db: AsyncSession, equipment_in: EquipmentCreate) -> Equipment:
+async def create_equipment(db: AsyncSession, equipment_in: EquipmentCreate, performed_by: int = None) -> Equipment:
     equipment = Equipment(**equipment_in.dict())
     db.add(equipment)
+    await db.flush()
+    # Начальный остаток тоже пишем в журнал движений
+    await record_movements(db, MovementAction.adjusted, {equipment.id: equipment.quantity_available or 0}, performed_by=performed_by)
     await db.commit()
+    bump_store_version(equipment.store_id)
     await db.refresh(equipment)
     return equipment
 
@@ -29,8 +37,38 @@ async def get_equipments(db: AsyncSession, skip: int = 0, limit: int = 100, stor
     result = await db.execute(query)
     return result.scalars().all()
 
-async def update_equipment(db: AsyncSession, equipment_id: int, equipment_in: EquipmentUpdate, store_id: int = None) -> Optional[Equipment]:
-    query = select(Equipment).where(Equipment.id == equipment_id, Equipment.is_deleted == False)
+async def get_equipment_rows(db: AsyncSession, skip: int = 0, limit: int = 100, store_id: int = None) -> List[dict]:
+    """Список техники плоскими строками: только поля ответа, название категории берётся в SQL"""
+    query = (
+        select(
+            Equipment.id,
+            Equipment.title,
+            Equipment.description,
+            Equipment.store_id,
+            Equipment.category_id,
+            Equipment.quantity_total,
+            Equipment.quantity_available,
+            Equipment.price_per_day,
+            Equipment.photos,
+            Equipment.status,
+            Equipment.is_deleted,
+            Equipment.created_at,
+            Equipment.updated_at,
+            Category.name.label("category_name"),
+        )
+        .outerjoin(Category, Category.id == Equipment.category_id)
+        .where(Equipment.is_deleted == False)
+    )
+    if store_id:
+        query = query.where(Equipment.store_id == store_id)
+    query = query.offset(skip).limit(limit)
+    result = await db.execute(query)
+    return [dict(row) for row in result.mappings()]
+
+async def update_equipment(db: AsyncSession, equipment_id: int, equipment_in: EquipmentUpdate, store_id: int = None, performed_by: int = None) -> Optional[Equipment]:
+    # Остаток записывается абсолютным значением, поэтому строку блокируем до коммита:
+    # иначе выдача или возврат между чтением и записью потерялись бы и в колонке, и в журнале
+    query = select(Equipment).where(Equipment.id == equipment_id, Equipment.is_deleted == False).with_for_update()
     if store_id:
         query = query.where(Equipment.store_id == store_id)
     result = await db.execute(query)
@@ -48,9 +86,13 @@ async def update_equipment(db: AsyncSession, equipment_id: int, equipment_in: Eq
         adjusted_available = max(0, min(new_total, new_total - currently_rented))
         incoming_data["quantity_available"] = adjusted_available
 
+    previous_available = equipment.quantity_available or 0
     for field, value in incoming_data.items():
         setattr(equipment, field, value)
+    delta = (equipment.quantity_available or 0) - previous_available
+    await record_movements(db, MovementAction.adjusted, {equipment.id: delta}, performed_by=performed_by)
     await db.commit()
+    bump_store_version(equipment.store_id)
     await db.refresh(equipment)
     return equipment
 
@@ -64,4 +106,5 @@ async def delete_equipment(db: AsyncSession, equipment_id: int, store_id: int =
         return False
     equipment.is_deleted = True
     await db.commit()
+    bump_store_version(equipment.store_id)
     return True 
\ No newline at end of file
@@ -0,0 +1,184 @@
+import base64
+import os
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import text, tuple_
+from datetime import date, datetime
+from typing import List, Optional
+from app.models.equipment import Equipment
+from app.models.equipment_movement import EquipmentMovement
+from app.models.user import User
+
+# Сколько месячных секций equipment_movements держать созданными заранее
+PARTITION_MONTHS_AHEAD = int(os.getenv("MOVEMENT_PARTITIONS_MONTHS_AHEAD", 3))
+# Ключ advisory-lock в PostgreSQL на время создания секций
+PARTITION_LOCK_KEY = 814_700_002
+
+
+def encode_cursor(timestamp: datetime, movement_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{movement_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp_part, id_part = raw.split("|")
+        return datetime.fromisoformat(timestamp_part), int(id_part)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _movement_filters(
+    query,
+    store_id: int = None,
+    equipment_id: int = None,
+    performed_by: int = None,
+    action: str = None,
+    date_from: date = None,
+    date_to: date = None,
+):
+    """Фильтры списка движений; запрос должен уже содержать join с equipment"""
+    query = query.where(EquipmentMovement.is_deleted == False)
+    if store_id:
+        query = query.where(Equipment.store_id == store_id)
+    if equipment_id:
+        query = query.where(EquipmentMovement.equipment_id == equipment_id)
+    if performed_by:
+        query = query.where(EquipmentMovement.performed_by == performed_by)
+    if action:
+        query = query.where(EquipmentMovement.action == action)
+    # Границы по timestamp позволяют PostgreSQL отбросить ненужные месячные секции
+    if date_from:
+        query = query.where(EquipmentMovement.timestamp >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.where(EquipmentMovement.timestamp <= datetime.combine(date_to, datetime.max.time()))
+    return query
+
+
+async def get_movements(
+    db: AsyncSession,
+    store_id: int = None,
+    equipment_id: int = None,
+    performed_by: int = None,
+    action: str = None,
+    date_from: date = None,
+    date_to: date = None,
+    cursor: str = None,
+    limit: int = 100,
+) -> List[EquipmentMovement]:
+    """Движения от новых к старым, сортировка (timestamp, id), keyset-пагинация по cursor.
+
+    Магазин определяется через технику, поэтому запрос всегда идёт через join с equipment.
+    """
+    query = _movement_filters(
+        select(EquipmentMovement).join(Equipment, Equipment.id == EquipmentMovement.equipment_id),
+        store_id, equipment_id, performed_by, action, date_from, date_to,
+    )
+    if cursor:
+        cursor_timestamp, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            tuple_(EquipmentMovement.timestamp, EquipmentMovement.id) < tuple_(cursor_timestamp, cursor_id)
+        )
+    query = query.order_by(EquipmentMovement.timestamp.desc(), EquipmentMovement.id.desc()).limit(limit)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+# Колонки выгрузки движений (GET /equipment-movements/export)
+EXPORT_COLUMNS = ("id", "timestamp", "equipment_id", "equipment", "action", "quantity", "rental_id", "performed_by", "performer")
+
+
+def movements_export_query(
+    store_id: int = None,
+    equipment_id: int = None,
+    performed_by: int = None,
+    action: str = None,
+    date_from: date = None,
+    date_to: date = None,
+):
+    """Запрос для выгрузки движений: те же фильтры и порядок, что у списка, колонки как в EXPORT_COLUMNS"""
+    query = (
+        select(
+            EquipmentMovement.id,
+            EquipmentMovement.timestamp,
+            EquipmentMovement.equipment_id,
+            Equipment.title,
+            EquipmentMovement.action,
+            EquipmentMovement.quantity,
+            EquipmentMovement.rental_id,
+            EquipmentMovement.performed_by,
+            User.full_name,
+        )
+        .join(Equipment, Equipment.id == EquipmentMovement.equipment_id)
+        .outerjoin(User, User.id == EquipmentMovement.performed_by)
+    )
+    query = _movement_filters(query, store_id, equipment_id, performed_by, action, date_from, date_to)
+    return query.order_by(EquipmentMovement.timestamp.desc(), EquipmentMovement.id.desc())
+
+
+def _month_start(day: date, shift: int = 0) -> date:
+    month = day.year * 12 + day.month - 1 + shift
+    return date(month // 12, month % 12 + 1, 1)
+
+
+async def _create_partition(db: AsyncSession, start: date, end: date, has_default: bool) -> str:
+    """Создаёт секцию за месяц; строки этого месяца из секции по умолчанию переносятся в неё"""
+    name = f"equipment_movements_{start:%Y_%m}"
+    bounds = {"start": start, "end": end}
+    in_default = has_default and await db.scalar(text(
+        'SELECT EXISTS (SELECT 1 FROM equipment_movements_default '
+        'WHERE "timestamp" >= CAST(:start AS date) AND "timestamp" < CAST(:end AS date))'
+    ), bounds)
+    create = (
+        f"CREATE TABLE {name} PARTITION OF equipment_movements "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    if not in_default:
+        await db.execute(text(create))
+        return name
+    # PostgreSQL не создаст секцию, пока подходящие строки лежат в секции по умолчанию:
+    # отсоединяем её, создаём секцию, переносим строки и присоединяем обратно (в одной транзакции)
+    await db.execute(text("ALTER TABLE equipment_movements DETACH PARTITION equipment_movements_default"))
+    await db.execute(text(create))
+    await db.execute(text(
+        "WITH moved AS (DELETE FROM equipment_movements_default "
+        'WHERE "timestamp" >= CAST(:start AS date) AND "timestamp" < CAST(:end AS date) RETURNING *) '
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds)
+    await db.execute(text("ALTER TABLE equipment_movements ATTACH PARTITION equipment_movements_default DEFAULT"))
+    return name
+
+
+async def ensure_movement_partitions(db: AsyncSession, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Создаёт месячные секции equipment_movements на текущий и следующие месяцы (только PostgreSQL).
+
+    Месяцы, строки которых уже попали в секцию по умолчанию (например, пока секции никто не создавал),
+    тоже получают свою секцию, а строки переносятся в неё.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return []
+    # Воркеры при старте и планировщик могут запуститься одновременно
+    await db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    partitioned = await db.scalar(text(
+        "SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('equipment_movements')"
+    ))
+    if not partitioned:
+        await db.commit()
+        return []
+    today = date.today()
+    months = {_month_start(today, shift) for shift in range(months_ahead + 1)}
+    has_default = await db.scalar(text("SELECT to_regclass('equipment_movements_default') IS NOT NULL"))
+    if has_default:
+        stray = (await db.execute(text(
+            """SELECT DISTINCT CAST(date_trunc('month', "timestamp") AS date) FROM equipment_movements_default"""
+        ))).scalars().all()
+        months.update(stray)
+    created = []
+    for start in sorted(months):
+        name = f"equipment_movements_{start:%Y_%m}"
+        if await db.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}):
+            continue
+        created.append(await _create_partition(db, start, _month_start(start, 1), has_default))
+    await db.commit()
+    return created
@@ -0,0 +1,205 @@
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete, func, insert
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from app.core.dashboard_cache import bump_store_version
+from app.models.category import Category
+from app.models.demand_forecast import DemandForecast
+from app.models.equipment import Equipment
+from app.models.rental import Rental, RentalStatus, RentalItem
+from app.models.store import Store
+
+# Сколько дней истории берём для прогноза (кратно неделе)
+HISTORY_DAYS = 52 * 7
+# Сезонный профиль по дням недели — среднее за последние SEASON_WEEKS недель
+SEASON_WEEKS = 8
+# Горизонт прогноза
+FORECAST_WEEKS = 8
+# Коэффициент экспоненциального сглаживания уровня
+SMOOTHING_ALPHA = 0.2
+
+
+def demand_matrix(category_ids, items, date_from: date, days: int) -> np.ndarray:
+    """Матрица [категория x день]: сколько единиц категории в аренде в каждый день"""
+    diff = np.zeros((len(category_ids), days + 1), dtype=np.float64)
+    if items:
+        index = {category_id: i for i, category_id in enumerate(category_ids)}
+        origin = date_from.toordinal()
+        rows = np.array([index[item.category_id] for item in items], dtype=np.int64)
+        starts = np.clip(np.array([item.date_start.toordinal() for item in items], dtype=np.int64) - origin, 0, days)
+        ends = np.clip(np.array([item.date_end.toordinal() for item in items], dtype=np.int64) - origin + 1, 0, days)
+        quantities = np.array([item.quantity or 0 for item in items], dtype=np.float64)
+        np.add.at(diff, (rows, starts), quantities)
+        np.add.at(diff, (rows, ends), -quantities)
+    return np.cumsum(diff, axis=1)[:, :days]
+
+
+def seasonal_forecast(history: np.ndarray, history_from: date, horizon: int) -> np.ndarray:
+    """Прогноз [категория x день] на horizon дней после истории.
+
+    Сезонность — скользящее среднее по каждому дню недели за последние SEASON_WEEKS недель,
+    уровень — экспоненциально взвешенное среднее ряда без сезонности (веса считаются сразу,
+    поэтому по всем категориям это одно матричное умножение).
+    """
+    categories, days = history.shape
+    if not categories:
+        return np.zeros((0, horizon))
+    # Номер дня недели для каждого дня истории и прогноза
+    first_weekday = history_from.weekday()
+    history_weekdays = (first_weekday + np.arange(days)) % 7
+    future_weekdays = (first_weekday + days + np.arange(horizon)) % 7
+
+    weeks = min(SEASON_WEEKS, days // 7)
+    recent = history[:, days - weeks * 7:]
+    recent_weekdays = history_weekdays[days - weeks * 7:]
+    profile = np.zeros((categories, 7))
+    for weekday in range(7):
+        profile[:, weekday] = recent[:, recent_weekdays == weekday].mean(axis=1)
+    mean = profile.mean(axis=1, keepdims=True)
+    seasonal = np.ones((categories, 7))
+    np.divide(profile, mean, out=seasonal, where=mean > 0)
+
+    # Без сезонности: делим на индекс дня недели. Дни недели с нулевым индексом (спроса не было)
+    # ничего не говорят об уровне и в сглаживание не входят
+    index = seasonal[:, history_weekdays]
+    observed = index > 0
+    deseasonalized = np.divide(history, index, out=np.zeros_like(history), where=observed)
+    # Экспоненциальные веса: чем свежее день, тем больше вес (нормируем по учтённым дням)
+    weights = (1 - SMOOTHING_ALPHA) ** np.arange(days)[::-1]
+    total_weight = observed @ weights
+    level = np.zeros(categories)
+    np.divide(deseasonalized @ weights, total_weight, out=level, where=total_weight > 0)
+    return level[:, None] * seasonal[:, future_weekdays]
+
+
+async def compute_store_forecast(db: AsyncSession, store_id: int, today: Optional[date] = None) -> int:
+    """Пересчитывает прогноз спроса по категориям магазина (в текущей транзакции)"""
+    today = today or date.today()
+    history_from = today - timedelta(days=HISTORY_DAYS)
+    history_to = today - timedelta(days=1)
+    horizon = FORECAST_WEEKS * 7
+    category_ids = (await db.execute(
+        select(Category.id)
+        .where(Category.store_id == store_id, Category.is_deleted == False)
+        .order_by(Category.id)
+    )).scalars().all()
+
+    # Одинаковые интервалы одной категории схлопываются в SQL
+    items = []
+    if category_ids:
+        items_query = (
+            select(
+                Equipment.category_id,
+                Rental.date_start,
+                Rental.date_end,
+                func.sum(RentalItem.quantity).label("quantity"),
+            )
+            .join(Rental, Rental.id == RentalItem.rental_id)
+            .join(Equipment, Equipment.id == RentalItem.equipment_id)
+            .where(
+                Rental.store_id == store_id,
+                Rental.is_deleted == False,
+                RentalItem.is_deleted == False,
+                Rental.status != RentalStatus.cancelled,
+                Equipment.category_id.in_(category_ids),
+                Rental.date_start <= history_to,
+                Rental.date_end >= history_from,
+            )
+            .group_by(Equipment.category_id, Rental.date_start, Rental.date_end)
+        )
+        connection = await db.connection()
+        items = (await connection.execute(items_query)).all()
+
+    history = demand_matrix(category_ids, items, history_from, HISTORY_DAYS)
+    forecast = seasonal_forecast(history, history_from, horizon)
+
+    computed_at = datetime.now(timezone.utc)
+    await db.execute(delete(DemandForecast).where(DemandForecast.store_id == store_id))
+    rows = [
+        {
+            "category_id": category_id,
+            "store_id": store_id,
+            "day": today + timedelta(days=offset),
+            "quantity": round(float(forecast[row, offset]), 2),
+            "computed_at": computed_at,
+        }
+        for row, category_id in enumerate(category_ids)
+        for offset in range(horizon)
+    ]
+    if rows:
+        await db.execute(insert(DemandForecast), rows)
+    return len(category_ids)
+
+
+async def run_demand_forecast(db: AsyncSession) -> int:
+    """Пересчёт прогноза по всем магазинам; каждый магазин в своей транзакции"""
+    store_ids = (await db.execute(select(Store.id).where(Store.is_deleted == False))).scalars().all()
+    categories = 0
+    for store_id in store_ids:
+        categories += await compute_store_forecast(db, store_id)
+        await db.commit()
+        bump_store_version(store_id)
+    return categories
+
+
+async def get_forecast(
+    db: AsyncSession,
+    store_id: int = None,
+    category_id: int = None,
+    weeks: int = FORECAST_WEEKS,
+    today: Optional[date] = None,
+) -> dict:
+    today = today or date.today()
+    date_to = today + timedelta(days=weeks * 7 - 1)
+    query = (
+        select(
+            DemandForecast.category_id,
+            Category.name,
+            DemandForecast.day,
+            DemandForecast.quantity,
+            DemandForecast.computed_at,
+        )
+        .join(Category, Category.id == DemandForecast.category_id)
+        .where(DemandForecast.day >= today, DemandForecast.day <= date_to)
+        .order_by(Category.name, DemandForecast.category_id, DemandForecast.day)
+    )
+    capacity_query = (
+        select(Equipment.category_id, func.coalesce(func.sum(Equipment.quantity_total), 0).label("quantity_total"))
+        .where(Equipment.is_deleted == False, Equipment.category_id.is_not(None))
+        .group_by(Equipment.category_id)
+    )
+    if store_id:
+        query = query.where(DemandForecast.store_id == store_id)
+        capacity_query = capacity_query.where(Equipment.store_id == store_id)
+    if category_id:
+        query = query.where(DemandForecast.category_id == category_id)
+        capacity_query = capacity_query.where(Equipment.category_id == category_id)
+    rows = (await db.execute(query)).all()
+    capacity = dict((await db.execute(capacity_query)).all())
+
+    categories = {}
+    computed_at = None
+    for row in rows:
+        category = categories.setdefault(row.category_id, {
+            "category_id": row.category_id,
+            "name": row.name,
+            "quantity_total": int(capacity.get(row.category_id, 0)),
+            "forecast": [],
+        })
+        category["forecast"].append({"day": row.day.isoformat(), "quantity": row.quantity})
+        if computed_at is None or row.computed_at < computed_at:
+            computed_at = row.computed_at
+    for category in categories.values():
+        quantities = [point["quantity"] for point in category["forecast"]]
+        category["peak"] = max(quantities)
+        category["average"] = round(sum(quantities) / len(quantities), 2)
+        # Дни, когда прогноз спроса больше, чем есть техники в категории
+        category["shortage_days"] = sum(1 for quantity in quantities if quantity > category["quantity_total"])
+    return {
+        "from": today.isoformat(),
+        "to": date_to.isoformat(),
+        "computed_at": computed_at.isoformat() if computed_at else None,
+        "categories": list(categories.values()),
+    }
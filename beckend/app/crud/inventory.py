@@ -0,0 +1,132 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, update
+from datetime import datetime, timezone
+from typing import List, Optional
+from app.crud.availability import ISSUED_STATUSES
+from app.crud.stock import ledger_quantities, record_movements
+from app.core.dashboard_cache import bump_store_versions
+from app.models.equipment import Equipment
+from app.models.equipment_movement import MovementAction
+from app.models.rental import Rental, RentalItem
+
+# Результат последней сверки в этом процессе (для /metrics)
+_last_report: Optional[dict] = None
+
+
+def _issued_quantities():
+    """Сколько единиц каждой техники сейчас выдано (активные и просроченные аренды)"""
+    return (
+        select(RentalItem.equipment_id, func.sum(RentalItem.quantity).label("issued"))
+        .join(Rental, Rental.id == RentalItem.rental_id)
+        .where(
+            Rental.status.in_(ISSUED_STATUSES),
+            Rental.is_deleted == False,
+            RentalItem.is_deleted == False,
+        )
+        .group_by(RentalItem.equipment_id)
+    )
+
+
+def _expected_available(issued):
+    return func.coalesce(Equipment.quantity_total, 0) - func.coalesce(issued, 0)
+
+
+async def reconcile_inventory(db: AsyncSession, store_id: int = None, fix: bool = False) -> dict:
+    """Сверяет quantity_available и остаток по журналу движений с ожидаемым (quantity_total минус выданное).
+
+    Колонка сверяется одним сгруппированным запросом, журнал — через ledger_quantities.
+    С fix=True колонка исправляется одним UPDATE, а в журнал пишутся корректировки
+    на разницу между ожидаемым и остатком по журналу, чтобы журнал тоже сошёлся.
+    """
+    issued = _issued_quantities().subquery()
+    expected = _expected_available(issued.c.issued)
+    query = (
+        select(
+            Equipment.id,
+            Equipment.store_id,
+            Equipment.title,
+            Equipment.quantity_total,
+            Equipment.quantity_available,
+            func.coalesce(issued.c.issued, 0).label("issued"),
+            expected.label("expected"),
+        )
+        .outerjoin(issued, issued.c.equipment_id == Equipment.id)
+        .where(Equipment.is_deleted == False)
+        .order_by(Equipment.id)
+    )
+    if store_id:
+        query = query.where(Equipment.store_id == store_id)
+    if fix:
+        # Блокируем строки техники до конца транзакции: выдачи и возвраты меняют колонку и пишут
+        # движения в одной транзакции, поэтому ни колонка, ни журнал не изменятся до UPDATE
+        query = query.with_for_update(of=Equipment)
+    rows = (await db.execute(query)).all()
+    ledger = await ledger_quantities(db, [row.id for row in rows] if store_id else None)
+    drifted: List[dict] = []
+    for row in rows:
+        expected_available = int(row.expected)
+        available = row.quantity_available or 0
+        ledger_available = ledger.get(row.id, 0)
+        if available == expected_available and ledger_available == expected_available:
+            continue
+        drifted.append({
+            "equipment_id": row.id,
+            "store_id": row.store_id,
+            "title": row.title,
+            "quantity_total": row.quantity_total,
+            "issued": int(row.issued),
+            "quantity_available": row.quantity_available,
+            "ledger": ledger_available,
+            "expected": expected_available,
+            "drift": available - expected_available,
+            "ledger_drift": ledger_available - expected_available,
+        })
+
+    if fix and drifted:
+        issued_for_equipment = (
+            select(func.sum(RentalItem.quantity))
+            .join(Rental, Rental.id == RentalItem.rental_id)
+            .where(
+                RentalItem.equipment_id == Equipment.id,
+                Rental.status.in_(ISSUED_STATUSES),
+                Rental.is_deleted == False,
+                RentalItem.is_deleted == False,
+            )
+            .scalar_subquery()
+        )
+        column_drifted = [item["equipment_id"] for item in drifted if item["drift"]]
+        if column_drifted:
+            await db.execute(
+                update(Equipment)
+                .where(Equipment.id.in_(column_drifted))
+                .values(quantity_available=_expected_available(issued_for_equipment))
+                .execution_options(synchronize_session=False)
+            )
+        # Корректировка считается от журнала, а не от колонки: иначе при уже разошедшемся журнале
+        # он ушёл бы от ожидаемого ещё дальше
+        await record_movements(
+            db, MovementAction.adjusted, {item["equipment_id"]: -item["ledger_drift"] for item in drifted}
+        )
+        await db.commit()
+        bump_store_versions({item["store_id"] for item in drifted})
+
+    report = {
+        "checked_at": datetime.now(timezone.utc).isoformat(),
+        "store_id": store_id,
+        "equipment_checked": len(rows),
+        "drifted": sum(1 for item in drifted if item["drift"]),
+        "total_abs_drift": sum(abs(item["drift"]) for item in drifted),
+        "ledger_drifted": sum(1 for item in drifted if item["ledger_drift"]),
+        "total_abs_ledger_drift": sum(abs(item["ledger_drift"]) for item in drifted),
+        "fixed": fix,
+        "items": drifted,
+    }
+    global _last_report
+    _last_report = {key: value for key, value in report.items() if key != "items"}
+    return report
+
+
+def inventory_drift_stats() -> Optional[dict]:
+    """Сводка последней сверки остатков (без списка позиций)"""
+    return _last_report
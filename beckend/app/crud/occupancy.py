@@ -0,0 +1,145 @@
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete, insert
+from datetime import date, timedelta
+from typing import Dict, List, Sequence
+from app.crud.availability import Interval, load_intervals
+from app.models.equipment import Equipment
+from app.models.equipment_occupancy import EquipmentDailyOccupancy
+from app.models.rental import Rental, RentalItem
+
+
+def occupancy_matrix(
+    intervals: Dict[int, List[Interval]],
+    equipment_ids: Sequence[int],
+    date_from: date,
+    date_to: date,
+) -> np.ndarray:
+    """Матрица занятости [техника x день] через разностный массив и накопленную сумму"""
+    days = (date_to - date_from).days + 1
+    index = {equipment_id: i for i, equipment_id in enumerate(equipment_ids)}
+    rows, starts, ends, quantities = [], [], [], []
+    origin = date_from.toordinal()
+    for equipment_id, items in intervals.items():
+        row = index.get(equipment_id)
+        if row is None:
+            continue
+        for start, end, quantity in items:
+            rows.append(row)
+            starts.append(start.toordinal() - origin)
+            ends.append(end.toordinal() - origin)
+            quantities.append(quantity)
+
+    diff = np.zeros((len(equipment_ids), days + 1), dtype=np.int64)
+    if rows:
+        rows = np.asarray(rows)
+        starts = np.clip(np.asarray(starts), 0, days)
+        ends = np.clip(np.asarray(ends) + 1, 0, days)
+        quantities = np.asarray(quantities, dtype=np.int64)
+        visible = starts < ends
+        np.add.at(diff, (rows[visible], starts[visible]), quantities[visible])
+        np.add.at(diff, (rows[visible], ends[visible]), -quantities[visible])
+    return np.cumsum(diff, axis=1)[:, :days]
+
+
+async def refresh_occupancy(
+    db: AsyncSession,
+    equipment_ids: Sequence[int],
+    date_from: date,
+    date_to: date,
+) -> None:
+    """Пересчитывает дневную занятость указанной техники за период (в текущей транзакции).
+
+    Строки техники блокируются по порядку id до конца транзакции: параллельные пересчёты той же
+    техники (выдача, возврат, удаление, просрочка) идут по очереди, а интервалы читаются уже
+    после блокировки и видят все закоммиченные аренды.
+    """
+    equipment_ids = sorted(set(equipment_ids))
+    if not equipment_ids or date_from > date_to:
+        return
+    stores = dict((await db.execute(
+        select(Equipment.id, Equipment.store_id)
+        .where(Equipment.id.in_(equipment_ids))
+        .order_by(Equipment.id)
+        .with_for_update()
+    )).all())
+    intervals = await load_intervals(db, date_from, date_to, equipment_ids)
+    matrix = occupancy_matrix(intervals, equipment_ids, date_from, date_to)
+
+    await db.execute(
+        delete(EquipmentDailyOccupancy).where(
+            EquipmentDailyOccupancy.equipment_id.in_(equipment_ids),
+            EquipmentDailyOccupancy.day >= date_from,
+            EquipmentDailyOccupancy.day <= date_to,
+        )
+    )
+    rows, offsets = np.nonzero(matrix)
+    if len(rows):
+        await db.execute(
+            insert(EquipmentDailyOccupancy),
+            [
+                {
+                    "equipment_id": equipment_ids[row],
+                    "store_id": stores[equipment_ids[row]],
+                    "day": date_from + timedelta(days=int(offset)),
+                    "quantity": int(matrix[row, offset]),
+                }
+                for row, offset in zip(rows, offsets)
+            ],
+        )
+
+
+async def refresh_rental_occupancy(db: AsyncSession, rental: Rental) -> None:
+    """Пересчитывает занятость по всем позициям аренды на её даты"""
+    equipment_ids = (await db.execute(
+        select(RentalItem.equipment_id).where(RentalItem.rental_id == rental.id)
+    )).scalars().all()
+    # Выданная техника могла задержаться после даты окончания
+    date_to = max(rental.date_end, date.today())
+    await refresh_occupancy(db, equipment_ids, rental.date_start, date_to)
+
+
+async def rebuild_occupancy(db: AsyncSession, store_id: int, date_from: date, date_to: date) -> None:
+    """Полный пересчёт занятости магазина за период"""
+    equipment_ids = (await db.execute(
+        select(Equipment.id).where(Equipment.store_id == store_id, Equipment.is_deleted == False)
+    )).scalars().all()
+    await refresh_occupancy(db, equipment_ids, date_from, date_to)
+    await db.commit()
+
+
+async def get_occupancy_matrix(
+    db: AsyncSession,
+    equipment_ids: Sequence[int],
+    date_from: date,
+    date_to: date,
+    store_id: int = None,
+) -> np.ndarray:
+    """Читает занятость из дневной таблицы и раскладывает её в матрицу [техника x день]"""
+    days = (date_to - date_from).days + 1
+    matrix = np.zeros((len(equipment_ids), days), dtype=np.int64)
+    if not equipment_ids:
+        return matrix
+    query = select(
+        EquipmentDailyOccupancy.equipment_id,
+        EquipmentDailyOccupancy.day,
+        EquipmentDailyOccupancy.quantity,
+    ).where(
+        EquipmentDailyOccupancy.day >= date_from,
+        EquipmentDailyOccupancy.day <= date_to,
+    )
+    # Для магазина фильтруем по store_id, чтобы не передавать в запрос тысячи id
+    if store_id:
+        query = query.where(EquipmentDailyOccupancy.store_id == store_id)
+    else:
+        query = query.where(EquipmentDailyOccupancy.equipment_id.in_(list(equipment_ids)))
+    index = {equipment_id: i for i, equipment_id in enumerate(equipment_ids)}
+    rows = [row for row in (await db.execute(query)).all() if row.equipment_id in index]
+    if rows:
+        origin = date_from.toordinal()
+        matrix[
+            [index[row.equipment_id] for row in rows],
+            [row.day.toordinal() - origin for row in rows],
+        ] = [row.quantity for row in rows]
+    return matrix
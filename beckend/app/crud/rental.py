@@ -1,33 +1,93 @@
+import base64
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
-from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import selectinload, aliased
+from sqlalchemy import and_, or_, func, case, cast, update, insert, tuple_, literal_column, Boolean, String, Text
 from datetime import timedelta, date, datetime
 from typing import List, Optional
 from app.models.rental import Rental, RentalStatus, RentalItem
 from app.models.equipment import Equipment
-from app.models.equipment_movement import EquipmentMovement
-from app.schemas.rental import RentalCreate
+from app.models.equipment_movement import MovementAction
+from app.models.rental_payment import RentalPayment, PaymentMethod
+from app.schemas.rental import RentalCreate, RentalFilter, RentalItemRead, RentalRead
 from app.models.user import User
+from app.crud.availability import check_availability, ISSUED_STATUSES
+from app.crud.occupancy import refresh_occupancy, refresh_rental_occupancy
+from app.crud.store_stats import refresh_store_stats
+from app.crud.stock import record_movements
+from app.core.dashboard_cache import bump_store_version, bump_store_versions
 
-async def create_rental(db: AsyncSession, rental_in: RentalCreate) -> Rental:
-    # Проверяем доступность техники и при необходимости уменьшаем кол-во до доступного
-    adjusted_items = []
-    for item in rental_in.items:
-        equipment = await db.get(Equipment, item.equipment_id)
-        if not equipment:
+def _merge_quantities(items) -> dict:
+    """Суммирует запрошенные количества по equipment_id (одна позиция может встречаться несколько раз)"""
+    quantities = {}
+    for item in items:
+        if (item.quantity or 0) <= 0:
+            raise ValueError("Количество техники должно быть больше нуля")
+        quantities[item.equipment_id] = quantities.get(item.equipment_id, 0) + item.quantity
+    return quantities
+
+async def _reserve_equipment(db: AsyncSession, quantities: dict, store_id: int = None) -> None:
+    """Атомарно списывает доступное количество техники одним UPDATE.
+
+    Строка обновляется только если quantity_available >= запрошенного, поэтому
+    параллельные брони не могут увести остаток в минус. Если хотя бы одна позиция
+    не прошла проверку, транзакция откатывается и выбрасывается ValueError.
+    """
+    requested = case(quantities, value=Equipment.id)
+    query = (
+        update(Equipment)
+        .where(
+            Equipment.id.in_(list(quantities)),
+            Equipment.is_deleted == False,
+            Equipment.quantity_available >= requested,
+        )
+        .values(quantity_available=Equipment.quantity_available - requested)
+        .returning(Equipment.id)
+        .execution_options(synchronize_session=False)
+    )
+    if store_id:
+        query = query.where(Equipment.store_id == store_id)
+    result = await db.execute(query)
+    reserved = set(result.scalars().all())
+    if len(reserved) == len(quantities):
+        return
+
+    await db.rollback()
+    missing = [equipment_id for equipment_id in quantities if equipment_id not in reserved]
+    lookup = select(Equipment.id, Equipment.title, Equipment.quantity_available).where(
+        Equipment.id.in_(missing), Equipment.is_deleted == False
+    )
+    if store_id:
+        lookup = lookup.where(Equipment.store_id == store_id)
+    found = {row.id: row for row in (await db.execute(lookup)).all()}
+    for equipment_id in missing:
+        row = found.get(equipment_id)
+        if row is None:
             raise ValueError("Техника не найдена")
-        available = equipment.quantity_available or 0
-        requested = item.quantity or 0
-        if available <= 0:
-            raise ValueError(f"Недостаточно техники {equipment.title} (доступно: 0, запрошено: {requested})")
-        adjusted_quantity = min(requested, available)
-        # Перезаписываем количество, если запрос превышает доступное
-        item.quantity = adjusted_quantity
-        adjusted_items.append(item)
-    
+    row = found[missing[0]]
+    raise ValueError(
+        f"Недостаточно техники {row.title} (доступно: {row.quantity_available or 0}, запрошено: {quantities[row.id]})"
+    )
+
+async def _release_equipment(db: AsyncSession, quantities: dict) -> None:
+    """Возвращает технику на склад одним UPDATE"""
+    returned = case(quantities, value=Equipment.id)
+    await db.execute(
+        update(Equipment)
+        .where(Equipment.id.in_(list(quantities)))
+        .values(quantity_available=Equipment.quantity_available + returned)
+        .execution_options(synchronize_session=False)
+    )
+
+async def create_rental(db: AsyncSession, rental_in: RentalCreate) -> Rental:
+    # Проверяем, что техника свободна на все даты аренды с учётом других броней и выдач
+    quantities = _merge_quantities(rental_in.items)
+    await check_availability(db, quantities, rental_in.date_start, rental_in.date_end, rental_in.store_id)
+    # Бронь не забирает технику со склада, списываем остаток только при выдаче
+    if rental_in.status == RentalStatus.active:
+        await _reserve_equipment(db, quantities, rental_in.store_id)
+
     # Создаем аренду
-    # Пересчитываем итоговую сумму с учетом скорректированных количеств
     # По умолчанию используем количество дней как разницу между датами (минимум 1)
     try:
         days = (rental_in.date_end - rental_in.date_start).days
@@ -36,7 +96,7 @@ async def create_rental(db: AsyncSession, rental_in: RentalCreate) -> Rental:
         days = 1
 
     recomputed_total = 0
-    for item in adjusted_items:
+    for item in rental_in.items:
         price_per_day = getattr(item, 'price_per_day', 0) or 0
         recomputed_total += (item.quantity or 0) * price_per_day * days
 
@@ -52,22 +112,27 @@ async def create_rental(db: AsyncSession, rental_in: RentalCreate) -> Rental:
     )
     db.add(rental)
     await db.flush()
-    
-    # Создаем элементы аренды и обновляем количество техники
-    for item in adjusted_items:
-        rental_item = RentalItem(
-            rental_id=rental.id,
-            equipment_id=item.equipment_id,
-            quantity=item.quantity,
-            price_per_day=item.price_per_day
-        )
-        db.add(rental_item)
-        
-        # Обновляем количество доступной техники
-        equipment = await db.get(Equipment, item.equipment_id)
-        equipment.quantity_available -= item.quantity
-    
+
+    # Создаем все элементы аренды одним INSERT
+    await db.execute(
+        insert(RentalItem),
+        [
+            {
+                "rental_id": rental.id,
+                "equipment_id": item.equipment_id,
+                "quantity": item.quantity,
+                "price_per_day": item.price_per_day,
+            }
+            for item in rental_in.items
+        ],
+    )
+    if rental_in.status == RentalStatus.active:
+        await record_movements(db, MovementAction.issued, quantities, rental.id, rental_in.admin_id)
+    await refresh_occupancy(db, list(quantities), rental_in.date_start, rental_in.date_end)
+    await refresh_store_stats(db, rental.store_id, [rental.date_start])
+
     await db.commit()
+    bump_store_version(rental.store_id)
     # Повторно загружаем rental с items для корректной сериализации
     result = await db.execute(
         select(Rental).options(selectinload(Rental.items)).where(Rental.id == rental.id)
@@ -82,54 +147,231 @@ async def get_rental(db: AsyncSession, rental_id: int, store_id: int = None) ->
     result = await db.execute(query)
     return result.scalar_one_or_none()
 
-async def get_rentals(db: AsyncSession, skip: int = 0, limit: int = 100, store_id: int = None):
-    query = select(Rental).options(selectinload(Rental.items)).where(Rental.is_deleted == False)
+def encode_cursor(date_start: date, rental_id: int) -> str:
+    raw = f"{date_start.isoformat()}|{rental_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date_part, id_part = raw.split("|")
+        return date.fromisoformat(date_part), int(id_part)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _rental_conditions(store_id: int = None, filters: RentalFilter = None) -> list:
+    conditions = [Rental.is_deleted == False]
     if store_id:
-        query = query.where(Rental.store_id == store_id)
-    query = query.offset(skip).limit(limit)
-    result = await db.execute(query)
-    rentals = result.scalars().all()
-    # Получаем client_id и admin_id для всех аренд
-    client_ids = list({r.client_id for r in rentals if r.client_id})
-    admin_ids = list({r.admin_id for r in rentals if r.admin_id})
-    clients = {}
-    admins = {}
-    if client_ids:
-        client_result = await db.execute(select(User).where(User.id.in_(client_ids)))
-        for user in client_result.scalars().all():
-            clients[user.id] = user
-    if admin_ids:
-        admin_result = await db.execute(select(User).where(User.id.in_(admin_ids)))
-        for user in admin_result.scalars().all():
-            admins[user.id] = user
-    # Формируем выдачу с ФИО, email, phone, admin_full_name
-    rentals_out = []
-    for r in rentals:
-        client = clients.get(r.client_id)
-        admin = admins.get(r.admin_id)
-        rental_dict = r.__dict__.copy()
-        rental_dict['items'] = r.items
-        rental_dict['client_full_name'] = client.full_name if client else None
-        rental_dict['client_email'] = client.email if client else None
-        rental_dict['client_phone'] = client.phone if client else None
-        rental_dict['admin_full_name'] = admin.full_name if admin else None
-        rentals_out.append(rental_dict)
-    return rentals_out
-
-async def delete_rental(db: AsyncSession, rental_id: int, store_id: int = None) -> bool:
-    query = select(Rental).where(Rental.id == rental_id, Rental.is_deleted == False)
+        conditions.append(Rental.store_id == store_id)
+    if filters is None:
+        return conditions
+    if filters.status:
+        conditions.append(Rental.status == filters.status)
+    if filters.date_from:
+        conditions.append(Rental.date_start >= filters.date_from)
+    if filters.date_to:
+        conditions.append(Rental.date_start <= filters.date_to)
+    if filters.client_id:
+        conditions.append(Rental.client_id == filters.client_id)
+    if filters.admin_id:
+        conditions.append(Rental.admin_id == filters.admin_id)
+    if filters.equipment_id:
+        conditions.append(
+            select(RentalItem.id)
+            .where(RentalItem.rental_id == Rental.id, RentalItem.equipment_id == filters.equipment_id)
+            .exists()
+        )
+    return conditions
+
+async def count_rentals(db: AsyncSession, store_id: int = None, filters: RentalFilter = None) -> int:
+    query = select(func.count()).select_from(Rental).where(*_rental_conditions(store_id, filters))
+    return await db.scalar(query) or 0
+
+async def get_rentals(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    store_id: int = None,
+    filters: RentalFilter = None,
+    cursor: str = None,
+):
+    """Список аренд от новых к старым, сортировка (date_start, id).
+
+    cursor — значение из предыдущей страницы (keyset-пагинация), skip оставлен для совместимости.
+    Возвращает строки (id, date_start, json): объект RentalRead целиком собирает база,
+    приложению остаётся склеить строки в массив.
+    """
+    client = aliased(User)
+    admin = aliased(User)
+    dialect = db.get_bind().dialect.name
+    columns = {
+        "id": Rental.id,
+        "client_id": Rental.client_id,
+        "admin_id": Rental.admin_id,
+        "store_id": Rental.store_id,
+        "date_start": Rental.date_start,
+        "date_end": Rental.date_end,
+        "total_amount": Rental.total_amount,
+        "status": Rental.status,
+        "comment": Rental.comment,
+        "is_deleted": Rental.is_deleted,
+        "client_full_name": client.full_name,
+        "client_email": client.email,
+        "client_phone": client.phone,
+        "admin_full_name": admin.full_name,
+        "items": _items_json(dialect),
+    }
+    query = (
+        select(
+            Rental.id,
+            Rental.date_start,
+            _json_object(dialect, {name: columns[name] for name in RentalRead.model_fields}).label("json"),
+        )
+        .outerjoin(client, client.id == Rental.client_id)
+        .outerjoin(admin, admin.id == Rental.admin_id)
+        .where(*_rental_conditions(store_id, filters))
+    )
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query = query.where(tuple_(Rental.date_start, Rental.id) < tuple_(cursor_date, cursor_id))
+    else:
+        query = query.offset(skip)
+    query = query.order_by(Rental.date_start.desc(), Rental.id.desc()).limit(limit)
+    return (await db.execute(query)).all()
+
+def _json_value(dialect: str, column):
+    # В SQLite булевы колонки хранятся как 0/1, в JSON они должны быть true/false
+    if dialect != "postgresql" and isinstance(column.type, Boolean):
+        return case((column == True, func.json("true")), else_=func.json("false"))
+    return column
+
+def _json_object(dialect: str, fields: dict):
+    """JSON-объект {ключ: выражение} текстом; ключи идут в порядке полей схемы ответа"""
+    arguments = []
+    for key, column in fields.items():
+        arguments.extend([literal_column(f"'{key}'"), _json_value(dialect, column)])
+    if dialect == "postgresql":
+        # Текстом, а не json: иначе драйвер разберёт его в dict, который пришлось бы снова сериализовать
+        return cast(func.json_build_object(*arguments), Text)
+    return func.json_object(*arguments)
+
+def _items_json(dialect: str):
+    """Позиции аренды одним JSON-массивом (коррелированный подзапрос)"""
+    columns = {
+        "id": RentalItem.id,
+        "rental_id": RentalItem.rental_id,
+        "equipment_id": RentalItem.equipment_id,
+        "quantity": RentalItem.quantity,
+        "price_per_day": RentalItem.price_per_day,
+        "is_deleted": RentalItem.is_deleted,
+    }
+    fields = []
+    for key in RentalItemRead.model_fields:
+        fields.extend([literal_column(f"'{key}'"), _json_value(dialect, columns[key])])
+    if dialect == "postgresql":
+        aggregated = func.json_agg(func.json_build_object(*fields))
+        subquery = select(aggregated).where(RentalItem.rental_id == Rental.id).scalar_subquery()
+        return func.coalesce(subquery, literal_column("'[]'::json"))
+    aggregated = func.json_group_array(func.json_object(*fields))
+    # json() сохраняет признак JSON, чтобы массив вложился в объект, а не строкой
+    return func.json(select(aggregated).where(RentalItem.rental_id == Rental.id).scalar_subquery())
+
+# Колонки выгрузки аренд (GET /rentals/export)
+EXPORT_COLUMNS = (
+    "id", "date_start", "date_end", "status", "client", "client_phone", "admin",
+    "total_amount", "paid_cash", "paid_card", "items", "comment",
+)
+
+def _items_text(dialect: str):
+    """Позиции аренды одной строкой: «Дрель x2; Пила x1» (коррелированный подзапрос)"""
+    label = Equipment.title + literal_column("' x'") + func.cast(RentalItem.quantity, String)
+    if dialect == "postgresql":
+        aggregated = func.string_agg(label, literal_column("'; '"))
+    else:
+        aggregated = func.group_concat(label, literal_column("'; '"))
+    return (
+        select(aggregated)
+        .select_from(RentalItem)
+        .join(Equipment, Equipment.id == RentalItem.equipment_id)
+        .where(RentalItem.rental_id == Rental.id, RentalItem.is_deleted == False)
+        .scalar_subquery()
+    )
+
+def _paid(method: PaymentMethod):
+    return (
+        select(func.coalesce(func.sum(RentalPayment.amount), 0))
+        .where(RentalPayment.rental_id == Rental.id, RentalPayment.method == method, RentalPayment.is_deleted == False)
+        .scalar_subquery()
+    )
+
+def rentals_export_query(dialect: str, store_id: int = None, filters: RentalFilter = None):
+    """Запрос для выгрузки аренд: те же фильтры и порядок, что у списка, колонки как в EXPORT_COLUMNS"""
+    client = aliased(User)
+    admin = aliased(User)
+    return (
+        select(
+            Rental.id,
+            Rental.date_start,
+            Rental.date_end,
+            Rental.status,
+            client.full_name,
+            client.phone,
+            admin.full_name,
+            Rental.total_amount,
+            _paid(PaymentMethod.cash),
+            _paid(PaymentMethod.card),
+            _items_text(dialect),
+            Rental.comment,
+        )
+        .outerjoin(client, client.id == Rental.client_id)
+        .outerjoin(admin, admin.id == Rental.admin_id)
+        .where(*_rental_conditions(store_id, filters))
+        .order_by(Rental.date_start.desc(), Rental.id.desc())
+    )
+
+async def delete_rental(db: AsyncSession, rental_id: int, store_id: int = None, performed_by: int = None) -> bool:
+    # Блокируем аренду до конца транзакции: повторное одновременное удаление дождётся первого
+    # и не вернёт технику на склад второй раз
+    query = select(Rental).where(Rental.id == rental_id, Rental.is_deleted == False).with_for_update()
     if store_id:
         query = query.where(Rental.store_id == store_id)
     result = await db.execute(query)
     rental = result.scalar_one_or_none()
     if not rental:
         return False
+    # Выданная техника возвращается на склад, иначе остаток навсегда останется уменьшенным
+    if rental.status in ISSUED_STATUSES:
+        items_result = await db.execute(
+            select(RentalItem.equipment_id, func.sum(RentalItem.quantity))
+            .where(RentalItem.rental_id == rental_id)
+            .group_by(RentalItem.equipment_id)
+        )
+        quantities = dict(items_result.all())
+        if quantities:
+            await _release_equipment(db, quantities)
+            await record_movements(db, MovementAction.returned, quantities, rental.id, performed_by)
     rental.is_deleted = True
+    await refresh_rental_occupancy(db, rental)
+    await refresh_store_stats(db, rental.store_id, [rental.date_start])
     await db.commit()
+    bump_store_version(rental.store_id)
     return True
 
-async def return_rental(db: AsyncSession, rental_id: int, store_id: int = None, cash: float = 0.0, card: float = 0.0) -> bool:
-    query = select(Rental).where(Rental.id == rental_id, Rental.status == RentalStatus.active)
+async def return_rental(
+    db: AsyncSession,
+    rental_id: int,
+    store_id: int = None,
+    cash: float = 0.0,
+    card: float = 0.0,
+    taken_by: int = None,
+) -> bool:
+    # Как в activate_booking: одновременный повторный возврат дождётся первого и увидит статус completed;
+    # удалённую аренду не возвращаем, её технику уже вернул delete_rental
+    query = (
+        select(Rental)
+        .where(Rental.id == rental_id, Rental.status == RentalStatus.active, Rental.is_deleted == False)
+        .with_for_update()
+    )
     if store_id:
         query = query.where(Rental.store_id == store_id)
     result = await db.execute(query)
@@ -138,45 +380,128 @@ async def return_rental(db: AsyncSession, rental_id: int, store_id: int = None,
         return False
     
     # Возвращаем технику
-    items_result = await db.execute(select(RentalItem).where(RentalItem.rental_id == rental_id))
-    items = items_result.scalars().all()
-    
-    for item in items:
-        equipment = await db.get(Equipment, item.equipment_id)
-        if equipment:
-            equipment.quantity_available += item.quantity
-    
-    # Сохраняем информацию об оплате в комментарий (пока без отдельной таблицы)
-    pay_note = f"cash:{max(0.0, cash or 0.0)}; card:{max(0.0, card or 0.0)}"
-    if rental.comment and rental.comment.strip():
-        rental.comment = f"{rental.comment} | {pay_note}"
-    else:
-        rental.comment = pay_note
+    items_result = await db.execute(
+        select(RentalItem.equipment_id, func.sum(RentalItem.quantity))
+        .where(RentalItem.rental_id == rental_id)
+        .group_by(RentalItem.equipment_id)
+    )
+    quantities = dict(items_result.all())
+    if quantities:
+        await _release_equipment(db, quantities)
+        await record_movements(db, MovementAction.returned, quantities, rental.id, taken_by)
+
+    # Оплаты при возврате пишем отдельными строками по способу оплаты
+    await _insert_payments(db, rental.id, {PaymentMethod.cash: cash, PaymentMethod.card: card}, taken_by)
 
     rental.status = RentalStatus.completed
+    await refresh_rental_occupancy(db, rental)
+    await refresh_store_stats(db, rental.store_id, [rental.date_start])
     await db.commit()
+    bump_store_version(rental.store_id)
     return True
 
-async def mark_overdue_rentals(db: AsyncSession):
+async def _insert_payments(db: AsyncSession, rental_id: int, amounts: dict, taken_by: int = None) -> None:
+    rows = [
+        {"rental_id": rental_id, "method": method, "amount": float(amount), "taken_by": taken_by, "timestamp": datetime.utcnow()}
+        for method, amount in amounts.items()
+        if amount and amount > 0
+    ]
+    if rows:
+        await db.execute(insert(RentalPayment), rows)
+
+async def add_payment(
+    db: AsyncSession,
+    rental_id: int,
+    method: PaymentMethod,
+    amount: float,
+    taken_by: int = None,
+    store_id: int = None,
+) -> RentalPayment:
+    """Добавляет (частичную) оплату к аренде"""
+    if amount is None or amount <= 0:
+        raise ValueError("Сумма оплаты должна быть больше нуля")
+    query = select(Rental).where(Rental.id == rental_id, Rental.is_deleted == False)
+    if store_id:
+        query = query.where(Rental.store_id == store_id)
+    rental = (await db.execute(query)).scalar_one_or_none()
+    if rental is None:
+        raise ValueError("Аренда не найдена")
+    payment = RentalPayment(rental_id=rental_id, method=method, amount=amount, taken_by=taken_by)
+    db.add(payment)
+    await db.flush()
+    await refresh_store_stats(db, rental.store_id, [rental.date_start])
+    await db.commit()
+    bump_store_version(rental.store_id)
+    await db.refresh(payment)
+    return payment
+
+async def get_payments(db: AsyncSession, rental_id: int, store_id: int = None) -> List[RentalPayment]:
+    query = (
+        select(RentalPayment)
+        .join(Rental, Rental.id == RentalPayment.rental_id)
+        .where(RentalPayment.rental_id == rental_id, RentalPayment.is_deleted == False)
+        .order_by(RentalPayment.timestamp, RentalPayment.id)
+    )
+    if store_id:
+        query = query.where(Rental.store_id == store_id)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+async def mark_overdue_rentals(db: AsyncSession, store_id: int = None) -> int:
+    """Переводит просроченные активные аренды в overdue одним UPDATE, возвращает число строк"""
     today = date.today()
-    result = await db.execute(
-        select(Rental).where(
-            and_(
-                Rental.status == RentalStatus.active,
-                Rental.date_end < today,
-                Rental.is_deleted == False
-            )
+    conditions = [
+        Rental.status == RentalStatus.active,
+        Rental.date_end < today,
+        Rental.is_deleted == False,
+    ]
+    if store_id:
+        conditions.append(Rental.store_id == store_id)
+    # Дни сводки, в которых поменяются счётчики статусов
+    affected_days = (await db.execute(
+        select(Rental.store_id, Rental.date_start).where(*conditions).distinct()
+    )).all()
+
+    query = (
+        update(Rental)
+        .where(*conditions)
+        .values(status=RentalStatus.overdue)
+        .execution_options(synchronize_session=False)
+    )
+    result = await db.execute(query)
+
+    # Невозвращённая техника остаётся занятой и после даты окончания — продлеваем календарь на сегодня
+    issued_query = (
+        select(RentalItem.equipment_id)
+        .join(Rental, Rental.id == RentalItem.rental_id)
+        .where(
+            Rental.status.in_((RentalStatus.active, RentalStatus.overdue)),
+            Rental.date_end < today,
+            Rental.is_deleted == False,
         )
+        .distinct()
     )
-    overdue_rentals = result.scalars().all()
-    
-    for rental in overdue_rentals:
-        rental.status = RentalStatus.overdue
-    
+    if store_id:
+        issued_query = issued_query.where(Rental.store_id == store_id)
+    issued_equipment_ids = (await db.execute(issued_query)).scalars().all()
+    await refresh_occupancy(db, issued_equipment_ids, today, today)
+
+    days_by_store = {}
+    for affected_store_id, day in affected_days:
+        days_by_store.setdefault(affected_store_id, []).append(day)
+    # Магазины по порядку id, чтобы блокировки сводок брались в одном порядке
+    for affected_store_id, days in sorted(days_by_store.items()):
+        await refresh_store_stats(db, affected_store_id, days)
+
     await db.commit()
+    if days_by_store:
+        bump_store_versions(days_by_store)
+    return result.rowcount
 
-async def activate_booking(db: AsyncSession, rental_id: int, store_id: int = None) -> bool:
-    query = select(Rental).where(Rental.id == rental_id, Rental.status == RentalStatus.booked)
+async def activate_booking(db: AsyncSession, rental_id: int, store_id: int = None, performed_by: int = None) -> bool:
+    # Блокируем бронь до конца транзакции: повторная одновременная выдача дождётся первой,
+    # увидит статус active и не спишет остаток второй раз
+    query = select(Rental).where(Rental.id == rental_id, Rental.status == RentalStatus.booked).with_for_update()
     if store_id:
         query = query.where(Rental.store_id == store_id)
     result = await db.execute(query)
@@ -184,20 +509,19 @@ async def activate_booking(db: AsyncSession, rental_id: int, store_id: int = Non
     if not rental:
         return False
     
-    # Проверяем доступность техники
+    # Даты брони уже зарезервированы при создании, при выдаче проверяем фактический остаток
     items_result = await db.execute(select(RentalItem).where(RentalItem.rental_id == rental_id))
     items = items_result.scalars().all()
-    
-    for item in items:
-        equipment = await db.get(Equipment, item.equipment_id)
-        if not equipment or equipment.quantity_available < item.quantity:
+    if items:
+        quantities = _merge_quantities(items)
+        try:
+            await _reserve_equipment(db, quantities, rental.store_id)
+        except ValueError:
             return False
-    
-    # Активируем аренду и обновляем количество техники
-    for item in items:
-        equipment = await db.get(Equipment, item.equipment_id)
-        equipment.quantity_available -= item.quantity
-    
+        await record_movements(db, MovementAction.issued, quantities, rental.id, performed_by)
+
     rental.status = RentalStatus.active
+    await refresh_store_stats(db, rental.store_id, [rental.date_start])
     await db.commit()
+    bump_store_version(rental.store_id)
     return True 
\ No newline at end of file
@@ -0,0 +1,126 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import and_, case, delete, func, insert, update
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+from app.models.equipment import Equipment
+from app.models.equipment_movement import EquipmentMovement, MovementAction
+from app.models.equipment_stock_snapshot import EquipmentStockSnapshot
+
+# Движения моложе этого в контрольную точку не попадают: id выдаются до коммита,
+# и более ранний id может появиться в таблице позже более позднего
+CHECKPOINT_LAG = timedelta(minutes=5)
+
+
+def movement_delta():
+    """Изменение quantity_available, которое даёт строка журнала"""
+    return case(
+        (EquipmentMovement.action == MovementAction.issued.value, -EquipmentMovement.quantity),
+        (EquipmentMovement.action == MovementAction.returned.value, EquipmentMovement.quantity),
+        (EquipmentMovement.action == MovementAction.adjusted.value, EquipmentMovement.quantity),
+        else_=0,
+    )
+
+
+async def record_movements(
+    db: AsyncSession,
+    action: MovementAction,
+    quantities: Dict[int, int],
+    rental_id: int = None,
+    performed_by: int = None,
+) -> None:
+    """Пишет движения по нескольким позициям одним INSERT (в текущей транзакции)"""
+    timestamp = datetime.utcnow()
+    rows = [
+        {
+            "equipment_id": equipment_id,
+            "rental_id": rental_id,
+            "action": action.value,
+            "quantity": quantity,
+            "performed_by": performed_by,
+            "timestamp": timestamp,
+        }
+        for equipment_id, quantity in quantities.items()
+        if quantity
+    ]
+    if rows:
+        await db.execute(insert(EquipmentMovement), rows)
+
+
+def _ledger_query(equipment_ids: Optional[Iterable[int]] = None, upto: Optional[int] = None):
+    """Остаток по журналу: снимок + движения после него (без снимка — вся история)"""
+    snapshot = EquipmentStockSnapshot
+    conditions = [
+        EquipmentMovement.equipment_id == Equipment.id,
+        EquipmentMovement.id > func.coalesce(snapshot.movement_id, 0),
+        EquipmentMovement.is_deleted == False,
+    ]
+    if upto is not None:
+        conditions.append(EquipmentMovement.id <= upto)
+    query = (
+        select(
+            Equipment.id,
+            Equipment.quantity_available,
+            (func.coalesce(snapshot.quantity_available, 0) + func.coalesce(func.sum(movement_delta()), 0)).label("ledger"),
+        )
+        .outerjoin(snapshot, snapshot.equipment_id == Equipment.id)
+        .outerjoin(EquipmentMovement, and_(*conditions))
+        .group_by(Equipment.id, Equipment.quantity_available, snapshot.quantity_available)
+    )
+    if equipment_ids is not None:
+        query = query.where(Equipment.id.in_(list(equipment_ids)))
+    return query
+
+
+async def ledger_quantities(db: AsyncSession, equipment_ids: Optional[Iterable[int]] = None) -> Dict[int, int]:
+    """Остатки техники, восстановленные по журналу движений (id -> quantity_available)"""
+    rows = (await db.execute(_ledger_query(equipment_ids))).all()
+    return {row.id: int(row.ledger) for row in rows}
+
+
+async def rebuild_quantity_available(db: AsyncSession, equipment_ids: Optional[Iterable[int]] = None) -> int:
+    """Выставляет quantity_available по журналу там, где он расходится; возвращает число исправленных позиций"""
+    rows = (await db.execute(_ledger_query(equipment_ids))).all()
+    changed = [
+        {"id": row.id, "quantity_available": int(row.ledger)}
+        for row in rows
+        if row.quantity_available != row.ledger
+    ]
+    if changed:
+        await db.execute(update(Equipment), changed)
+    await db.commit()
+    return len(changed)
+
+
+async def checkpoint_stock(db: AsyncSession) -> int:
+    """Записывает новые контрольные точки по журналу; возвращает число обновлённых снимков"""
+    taken_at = datetime.now(timezone.utc)
+    upto = await db.scalar(
+        select(func.max(EquipmentMovement.id)).where(EquipmentMovement.timestamp < datetime.utcnow() - CHECKPOINT_LAG)
+    )
+    if upto is None:
+        return 0
+    # Только техника, по которой были движения после прошлого снимка
+    moved = (
+        select(EquipmentMovement.equipment_id)
+        .outerjoin(EquipmentStockSnapshot, EquipmentStockSnapshot.equipment_id == EquipmentMovement.equipment_id)
+        .where(
+            EquipmentMovement.id <= upto,
+            EquipmentMovement.id > func.coalesce(EquipmentStockSnapshot.movement_id, 0),
+        )
+        .distinct()
+    )
+    equipment_ids = (await db.execute(moved)).scalars().all()
+    if not equipment_ids:
+        return 0
+    rows = (await db.execute(_ledger_query(equipment_ids, upto))).all()
+    await db.execute(delete(EquipmentStockSnapshot).where(EquipmentStockSnapshot.equipment_id.in_(equipment_ids)))
+    await db.execute(
+        insert(EquipmentStockSnapshot),
+        [
+            {"equipment_id": row.id, "movement_id": upto, "quantity_available": int(row.ledger), "taken_at": taken_at}
+            for row in rows
+        ],
+    )
+    await db.commit()
+    return len(rows)
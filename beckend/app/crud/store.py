@@ -1,8 +1,9 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, case
 from app.models.store import Store
 from app.schemas.store import StoreCreate, StoreUpdate
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from datetime import date
 
 async def get_store(db: AsyncSession, store_id: int) -> Optional[Store]:
     """Получить магазин по ID"""
@@ -95,6 +96,9 @@ async def delete_store(db: AsyncSession, store_id: int) -> bool:
     # Теперь удаляем сам магазин
     await db.delete(db_store)
     await db.commit()
+    from app.core.auth import invalidate_principal
+    for user in users:
+        invalidate_principal(user.id)
     return True
 
 async def get_store_by_email(db: AsyncSession, email: str) -> Optional[Store]:
@@ -106,8 +110,8 @@ async def get_store_by_slug(db: AsyncSession, slug: str) -> Optional[Store]:
     result = await db.execute(select(Store).filter(Store.slug == slug))
     return result.scalar_one_or_none()
 
-async def get_store_stats(db: AsyncSession, store_id: int) -> dict:
-    """Получить статистику магазина"""
+async def get_store_stats(db: AsyncSession, store_id: int, date_from: date = None, date_to: date = None) -> dict:
+    """Получить статистику магазина (и сводку за период из store_daily_stats, если он задан)"""
     from app.models.user import User
     from app.models.equipment import Equipment
     from app.models.rental import Rental
@@ -142,9 +146,95 @@ async def get_store_stats(db: AsyncSession, store_id: int) -> dict:
     )
     total_rentals = result.scalar()
     
-    return {
+    stats = {
         "total_employees": total_employees,
         "total_equipment": total_equipment,
         "active_rentals": active_rentals,
         "total_rentals": total_rentals
-    } 
\ No newline at end of file
+    }
+    if date_from and date_to:
+        from app.crud.store_stats import get_period_stats
+        stats["period"] = await get_period_stats(db, date_from, date_to, store_id)
+    return stats 
+
+# Поля, по которым можно сортировать сводку магазинов
+OVERVIEW_SORT_FIELDS = ("name", "employees", "equipment", "active_rentals", "overdue_rentals", "rentals", "revenue")
+
+async def get_stores_overview(
+    db: AsyncSession,
+    date_from: date,
+    date_to: date,
+    skip: int = 0,
+    limit: int = 100,
+    sort: str = "name",
+    descending: bool = False,
+) -> Tuple[List[dict], int]:
+    """Показатели всех магазинов одним запросом: сотрудники, техника, активные/просроченные аренды, выручка за период"""
+    from app.models.user import User
+    from app.models.equipment import Equipment
+    from app.models.rental import Rental, RentalStatus
+    from app.models.store_daily_stats import StoreDailyStats
+
+    employees = (
+        select(User.store_id, func.count().label("employees"))
+        .where(User.role.in_(['store_admin', 'staff']))
+        .group_by(User.store_id)
+        .subquery()
+    )
+    equipment = (
+        select(Equipment.store_id, func.count().label("equipment"))
+        .where(Equipment.is_deleted == False)
+        .group_by(Equipment.store_id)
+        .subquery()
+    )
+    rentals = (
+        select(
+            Rental.store_id,
+            func.count(case((Rental.status == RentalStatus.active, 1))).label("active_rentals"),
+            func.count(case((Rental.status == RentalStatus.overdue, 1))).label("overdue_rentals"),
+        )
+        .where(Rental.is_deleted == False, Rental.status.in_((RentalStatus.active, RentalStatus.overdue)))
+        .group_by(Rental.store_id)
+        .subquery()
+    )
+    # Выручка и число аренд за период — из дневной сводки store_daily_stats
+    period = (
+        select(
+            StoreDailyStats.store_id,
+            func.sum(StoreDailyStats.rentals).label("rentals"),
+            func.sum(StoreDailyStats.revenue).label("revenue"),
+        )
+        .where(StoreDailyStats.day >= date_from, StoreDailyStats.day <= date_to)
+        .group_by(StoreDailyStats.store_id)
+        .subquery()
+    )
+    columns = {
+        "name": Store.name,
+        "employees": func.coalesce(employees.c.employees, 0),
+        "equipment": func.coalesce(equipment.c.equipment, 0),
+        "active_rentals": func.coalesce(rentals.c.active_rentals, 0),
+        "overdue_rentals": func.coalesce(rentals.c.overdue_rentals, 0),
+        "rentals": func.coalesce(period.c.rentals, 0),
+        "revenue": func.coalesce(period.c.revenue, 0),
+    }
+    sort_column = columns[sort]
+    query = (
+        select(
+            Store.id,
+            Store.is_active,
+            *[column.label(name) for name, column in columns.items()],
+            # Общее число магазинов для пагинации — в том же запросе
+            func.count().over().label("total"),
+        )
+        .outerjoin(employees, employees.c.store_id == Store.id)
+        .outerjoin(equipment, equipment.c.store_id == Store.id)
+        .outerjoin(rentals, rentals.c.store_id == Store.id)
+        .outerjoin(period, period.c.store_id == Store.id)
+        .order_by(sort_column.desc() if descending else sort_column.asc(), Store.id)
+        .offset(skip)
+        .limit(limit)
+    )
+    rows = (await db.execute(query)).mappings().all()
+    # Страница за пределами списка: total берём отдельным запросом
+    total = rows[0]["total"] if rows else await db.scalar(select(func.count(Store.id)))
+    return [{key: value for key, value in row.items() if key != "total"} for row in rows], total
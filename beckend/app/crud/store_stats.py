@@ -0,0 +1,272 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import and_, case, delete, func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+from app.core.sketch import build_sketch, estimate_cardinality, merge_sketches
+from app.models.rental import Rental, RentalStatus
+from app.models.rental_payment import RentalPayment, PaymentMethod
+from app.models.store_daily_stats import StoreDailyStats
+
+# Ключ advisory-lock в PostgreSQL (вторая часть — id магазина): сводку одного магазина
+# пересчитывают по очереди, иначе параллельные аренды затирают итоги друг друга
+STATS_LOCK_KEY = 814_700_003
+
+
+def _status_column(status: RentalStatus):
+    return getattr(StoreDailyStats, status.value)
+
+
+async def _lock_store_stats(db: AsyncSession, store_id: int) -> None:
+    """Блокировка сводки магазина до конца транзакции (SQLite и так сериализует запись)"""
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(:key, :store_id)"), {"key": STATS_LOCK_KEY, "store_id": store_id}
+        )
+
+
+def _upsert_stats(dialect: str, columns: Iterable[str]):
+    """INSERT ... ON CONFLICT (store_id, day) DO UPDATE пересчитанных колонок"""
+    statement = (postgresql if dialect == "postgresql" else sqlite).insert(StoreDailyStats)
+    values = {name: statement.excluded[name] for name in columns if name not in ("store_id", "day")}
+    # onupdate колонки в ON CONFLICT не срабатывает, created_at остаётся от первой вставки
+    values["updated_at"] = func.now()
+    return statement.on_conflict_do_update(
+        index_elements=[StoreDailyStats.store_id, StoreDailyStats.day],
+        set_=values,
+    )
+
+
+async def _recompute(db: AsyncSession, store_id: int, rental_filter, stats_filter) -> None:
+    """Пересчитывает строки сводки из аренд и оплат под блокировкой магазина.
+
+    Запросы идут после блокировки, поэтому видят аренды всех транзакций, закоммиченных до неё.
+    """
+    await _lock_store_stats(db, store_id)
+    rentals_query = (
+        select(
+            Rental.date_start,
+            func.count().label("rentals"),
+            func.coalesce(func.sum(Rental.total_amount), 0).label("revenue"),
+            *[func.count(case((Rental.status == status, 1))).label(status.value) for status in RentalStatus],
+        )
+        .where(Rental.store_id == store_id, Rental.is_deleted == False, rental_filter)
+        .group_by(Rental.date_start)
+    )
+    payments_query = (
+        select(
+            Rental.date_start,
+            func.coalesce(func.sum(case((RentalPayment.method == PaymentMethod.cash, RentalPayment.amount))), 0).label("cash"),
+            func.coalesce(func.sum(case((RentalPayment.method == PaymentMethod.card, RentalPayment.amount))), 0).label("card"),
+        )
+        .join(Rental, Rental.id == RentalPayment.rental_id)
+        .where(Rental.store_id == store_id, Rental.is_deleted == False, RentalPayment.is_deleted == False, rental_filter)
+        .group_by(Rental.date_start)
+    )
+    clients_query = (
+        select(Rental.date_start, Rental.client_id)
+        .where(Rental.store_id == store_id, Rental.is_deleted == False, rental_filter)
+        .distinct()
+    )
+
+    payments = {row.date_start: row for row in (await db.execute(payments_query)).all()}
+    clients = {}
+    for day, client_id in (await db.execute(clients_query)).all():
+        clients.setdefault(day, []).append(client_id)
+    rows = [
+        {
+            "store_id": store_id,
+            "day": row.date_start,
+            "rentals": row.rentals,
+            "revenue": float(row.revenue),
+            "cash": float(payments[row.date_start].cash) if row.date_start in payments else 0.0,
+            "card": float(payments[row.date_start].card) if row.date_start in payments else 0.0,
+            "clients_sketch": build_sketch(clients.get(row.date_start, [])),
+            **{status.value: getattr(row, status.value) for status in RentalStatus},
+        }
+        for row in (await db.execute(rentals_query)).all()
+    ]
+
+    # Дни, где аренд больше нет, удаляются, остальные обновляются на месте
+    await db.execute(
+        delete(StoreDailyStats).where(
+            StoreDailyStats.store_id == store_id,
+            stats_filter,
+            StoreDailyStats.day.not_in([row["day"] for row in rows]),
+        )
+    )
+    if rows:
+        await db.execute(_upsert_stats(db.get_bind().dialect.name, rows[0]), rows)
+
+
+async def refresh_store_stats(db: AsyncSession, store_id: int, days: Iterable[date]) -> None:
+    """Пересчитывает сводку магазина за указанные дни (в текущей транзакции)"""
+    days = sorted(set(days))
+    if not store_id or not days:
+        return
+    await _recompute(db, store_id, Rental.date_start.in_(days), StoreDailyStats.day.in_(days))
+
+
+async def rebuild_store_stats(db: AsyncSession, store_id: int, date_from: date, date_to: date) -> None:
+    """Полный пересчёт сводки магазина за период"""
+    await _recompute(
+        db,
+        store_id,
+        and_(Rental.date_start >= date_from, Rental.date_start <= date_to),
+        and_(StoreDailyStats.day >= date_from, StoreDailyStats.day <= date_to),
+    )
+    await db.commit()
+
+
+def period_totals_query(date_from: date, date_to: date, store_id: int = None, today: Optional[date] = None):
+    """Однострочный SELECT с суммами сводки за период (и за сегодня, если передан today)"""
+    in_range = and_(StoreDailyStats.day >= date_from, StoreDailyStats.day <= date_to)
+    columns = [
+        func.coalesce(func.sum(case((in_range, StoreDailyStats.rentals))), 0).label("rentals_count"),
+        func.coalesce(func.sum(case((in_range, StoreDailyStats.revenue))), 0).label("revenue_total"),
+        func.coalesce(func.sum(case((in_range, StoreDailyStats.cash))), 0).label("cash"),
+        func.coalesce(func.sum(case((in_range, StoreDailyStats.card))), 0).label("card"),
+        *[
+            func.coalesce(func.sum(case((in_range, _status_column(status)))), 0).label(f"status_{status.value}")
+            for status in RentalStatus
+        ],
+    ]
+    condition = in_range
+    if today is not None:
+        is_today = StoreDailyStats.day == today
+        columns += [
+            func.coalesce(func.sum(case((is_today, StoreDailyStats.rentals))), 0).label("rentals_today"),
+            func.coalesce(func.sum(case((is_today, StoreDailyStats.revenue))), 0).label("total_amount_today"),
+        ]
+        condition = in_range | is_today
+    query = select(*columns).where(condition)
+    if store_id:
+        query = query.where(StoreDailyStats.store_id == store_id)
+    return query
+
+
+async def count_unique_clients(db: AsyncSession, date_from: date, date_to: date, store_id: int = None) -> int:
+    """Оценка числа уникальных клиентов за период по объединению дневных скетчей"""
+    query = select(StoreDailyStats.clients_sketch).where(
+        StoreDailyStats.day >= date_from,
+        StoreDailyStats.day <= date_to,
+    )
+    if store_id:
+        query = query.where(StoreDailyStats.store_id == store_id)
+    sketches = (await db.execute(query)).scalars().all()
+    return estimate_cardinality(merge_sketches(sketches))
+
+
+def status_counts(totals) -> dict:
+    """Ненулевые счётчики статусов из строки period_totals_query"""
+    return {
+        str(status): totals[f"status_{status.value}"]
+        for status in RentalStatus
+        if totals[f"status_{status.value}"]
+    }
+
+
+async def get_period_stats(db: AsyncSession, date_from: date, date_to: date, store_id: int = None) -> dict:
+    totals = (await db.execute(period_totals_query(date_from, date_to, store_id))).mappings().one()
+    rentals_count = totals["rentals_count"]
+    revenue_total = totals["revenue_total"]
+    return {
+        "start": date_from.isoformat(),
+        "end": date_to.isoformat(),
+        "rentals": rentals_count,
+        "revenue": revenue_total,
+        "unique_clients": await count_unique_clients(db, date_from, date_to, store_id),
+        "status_counts": status_counts(totals),
+        "avg_check": float(revenue_total) / float(rentals_count) if rentals_count else 0.0,
+        "cash": float(totals["cash"]),
+        "card": float(totals["card"]),
+    }
+
+
+GRANULARITIES = ("day", "week", "month")
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """Начало интервала, в который попадает день (неделя — с понедельника)"""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _bucket_starts(date_from: date, date_to: date, granularity: str) -> List[date]:
+    buckets = []
+    current = bucket_start(date_from, granularity)
+    while current <= date_to:
+        buckets.append(current)
+        if granularity == "week":
+            current += timedelta(days=7)
+        elif granularity == "month":
+            current = (current + timedelta(days=32)).replace(day=1)
+        else:
+            current += timedelta(days=1)
+    return buckets
+
+
+def _series(rows, date_from: date, date_to: date, granularity: str) -> List[dict]:
+    """Раскладывает дневные строки по интервалам, пустые интервалы заполняются нулями"""
+    buckets = {
+        start: {"rentals": 0, "revenue": 0.0, "sketches": []}
+        for start in _bucket_starts(date_from, date_to, granularity)
+    }
+    for row in rows:
+        if date_from <= row.day <= date_to:
+            bucket = buckets[bucket_start(row.day, granularity)]
+            bucket["rentals"] += row.rentals
+            bucket["revenue"] += row.revenue
+            bucket["sketches"].append(row.clients_sketch)
+    return [
+        {
+            # Крайние интервалы обрезаются границами периода
+            "start": max(start, date_from).isoformat(),
+            "rentals": bucket["rentals"],
+            "revenue": bucket["revenue"],
+            "avg_check": bucket["revenue"] / bucket["rentals"] if bucket["rentals"] else 0.0,
+            "unique_clients": estimate_cardinality(merge_sketches(bucket["sketches"])),
+        }
+        for start, bucket in buckets.items()
+    ]
+
+
+async def get_timeseries(
+    db: AsyncSession,
+    date_from: date,
+    date_to: date,
+    granularity: str = "day",
+    store_id: int = None,
+    compare: bool = False,
+) -> dict:
+    """Выручка, число аренд, средний чек и уникальные клиенты по дням/неделям/месяцам.
+
+    Все дневные строки (включая предыдущий период для сравнения) читаются одним запросом.
+    """
+    length = date_to - date_from + timedelta(days=1)
+    previous_from, previous_to = date_from - length, date_from - timedelta(days=1)
+    query = (
+        select(StoreDailyStats.day, StoreDailyStats.rentals, StoreDailyStats.revenue, StoreDailyStats.clients_sketch)
+        .where(StoreDailyStats.day >= (previous_from if compare else date_from), StoreDailyStats.day <= date_to)
+    )
+    if store_id:
+        query = query.where(StoreDailyStats.store_id == store_id)
+    rows = (await db.execute(query)).all()
+
+    result = {
+        "granularity": granularity,
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "series": _series(rows, date_from, date_to, granularity),
+    }
+    if compare:
+        result["previous"] = {
+            "from": previous_from.isoformat(),
+            "to": previous_to.isoformat(),
+            "series": _series(rows, previous_from, previous_to, granularity),
+        }
+    return result
@@ -2,23 +2,17 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.user import User, UserRole
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.auth import get_password_hash
-from passlib.context import CryptContext
+from app.core.auth import get_password_hash_async, invalidate_principal
 from typing import Optional
 from datetime import datetime
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
 async def create_user(db: AsyncSession, user_in: UserCreate, role: UserRole = UserRole.staff):
     # Проверяем, существует ли пользователь с таким email
     existing_user = await get_user_by_email(db, user_in.email)
     if existing_user:
         raise ValueError(f"Пользователь с email {user_in.email} уже существует")
     
-    hashed_password = get_password_hash(user_in.password)
+    hashed_password = await get_password_hash_async(user_in.password)
     
     # Преобразуем birth_date из строки в объект date если он есть
     birth_date = None
@@ -102,6 +96,7 @@ async def update_user(db: AsyncSession, user_id: int, user_data: dict, store_id:
         for field, value in user_data.items():
             setattr(user, field, value)
         await db.commit()
+        invalidate_principal(user.id)
         await db.refresh(user)
     return user
 
@@ -114,6 +109,7 @@ async def delete_client(db: AsyncSession, user_id: int, store_id: int = None):
     if user:
         await db.delete(user)
         await db.commit()
+        invalidate_principal(user_id)
         return True
     return False 
 
@@ -133,4 +129,5 @@ async def delete_user_by_id(db: AsyncSession, user_id: int, store_id: int | None
         return False
     await db.delete(user)
     await db.commit()
+    invalidate_principal(user_id)
     return True
\ No newline at end of file
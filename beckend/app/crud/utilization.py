@@ -0,0 +1,162 @@
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, or_
+from datetime import date
+from app.crud.availability import ISSUED_STATUSES
+from app.models.category import Category
+from app.models.equipment import Equipment
+from app.models.rental import Rental, RentalStatus, RentalItem
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    result = np.zeros(len(numerator), dtype=np.float64)
+    np.divide(numerator, denominator, out=result, where=denominator > 0)
+    return result
+
+
+def _rows(keys, rented, available, revenue, units, idle) -> list:
+    utilization = _ratio(rented, available)
+    revenue_per_unit = _ratio(revenue, units)
+    return [
+        {
+            **keys[i],
+            "rented_unit_days": int(rented[i]),
+            "available_unit_days": int(available[i]),
+            "utilization": round(float(utilization[i]), 4),
+            "revenue": round(float(revenue[i]), 2),
+            "revenue_per_unit": round(float(revenue_per_unit[i]), 2),
+            "idle_days": int(idle[i]),
+        }
+        for i in range(len(keys))
+    ]
+
+
+async def get_utilization(
+    db: AsyncSession,
+    date_from: date,
+    date_to: date,
+    store_id: int = None,
+    category_id: int = None,
+) -> dict:
+    """Загрузка техники за период — доля занятых единиц·дней от доступных, выручка на единицу
+    и дни простоя — по каждой технике и по категориям.
+
+    Интервалы позиций аренды обрабатываются массивами NumPy: пересечение с периодом,
+    суммы через bincount и дневная занятость через разностный массив.
+    """
+    days = (date_to - date_from).days + 1
+    equipment_query = (
+        select(Equipment.id, Equipment.title, Equipment.category_id, Category.name.label("category_name"), Equipment.quantity_total)
+        .outerjoin(Category, Category.id == Equipment.category_id)
+        .where(Equipment.is_deleted == False)
+        .order_by(Equipment.title, Equipment.id)
+    )
+    if store_id:
+        equipment_query = equipment_query.where(Equipment.store_id == store_id)
+    if category_id:
+        equipment_query = equipment_query.where(Equipment.category_id == category_id)
+    equipments = (await db.execute(equipment_query)).all()
+
+    # Одинаковые интервалы одной техники схлопываются в SQL, чтобы передавать меньше строк
+    issued = Rental.status.in_(ISSUED_STATUSES)
+    items_query = (
+        select(
+            RentalItem.equipment_id,
+            Rental.date_start,
+            Rental.date_end,
+            issued.label("issued"),
+            func.sum(RentalItem.quantity).label("quantity"),
+            func.sum(RentalItem.quantity * RentalItem.price_per_day).label("amount_per_day"),
+        )
+        .join(Rental, Rental.id == RentalItem.rental_id)
+        .where(
+            Rental.is_deleted == False,
+            RentalItem.is_deleted == False,
+            Rental.status != RentalStatus.cancelled,
+            Rental.date_start <= date_to,
+            or_(Rental.date_end >= date_from, issued),
+        )
+        .group_by(RentalItem.equipment_id, Rental.date_start, Rental.date_end, issued)
+    )
+    if store_id:
+        items_query = items_query.where(Rental.store_id == store_id)
+    # Строки без ORM-обработки: здесь их могут быть сотни тысяч
+    connection = await db.connection()
+    items = (await connection.execute(items_query)).all()
+
+    count = len(equipments)
+    quantity_total = np.array([eq.quantity_total or 0 for eq in equipments], dtype=np.int64)
+    occupied = np.zeros((count, days + 1), dtype=np.int64)
+    rented = np.zeros(count, dtype=np.int64)
+    revenue = np.zeros(count, dtype=np.float64)
+    if items:
+        origin = date_from.toordinal()
+        today = date.today().toordinal() - origin
+        equipment_ids, date_starts, date_ends, issued_flags, quantities, amounts = zip(*items)
+        # id техники -> номер строки; позиции по технике вне выборки (удалённой, другой категории) дают -1
+        equipment_ids = np.array(equipment_ids, dtype=np.int64)
+        lookup = np.full(max(equipment_ids.max(), max((eq.id for eq in equipments), default=0)) + 1, -1, dtype=np.int64)
+        lookup[[eq.id for eq in equipments]] = np.arange(count)
+        rows = lookup[equipment_ids]
+        starts = np.array([day.toordinal() for day in date_starts], dtype=np.int64) - origin
+        ends = np.array([day.toordinal() for day in date_ends], dtype=np.int64) - origin
+        # Выданная техника занята до возврата, даже если дата окончания прошла
+        ends = np.where(np.array(issued_flags, dtype=bool), np.maximum(ends, today), ends)
+        quantities = np.array([quantity or 0 for quantity in quantities], dtype=np.int64)
+        amounts = np.array([amount or 0 for amount in amounts], dtype=np.float64)
+
+        # Пересечение интервалов [start, end] с периодом [0, days - 1]
+        starts = np.clip(starts, 0, days)
+        ends = np.clip(ends + 1, 0, days)
+        overlap = np.maximum(ends - starts, 0)
+        visible = (overlap > 0) & (rows >= 0)
+        rows, starts, ends, overlap = rows[visible], starts[visible], ends[visible], overlap[visible]
+        quantities, amounts = quantities[visible], amounts[visible]
+
+        rented = np.bincount(rows, weights=quantities * overlap, minlength=count).astype(np.int64)
+        revenue = np.bincount(rows, weights=amounts * overlap, minlength=count)
+        np.add.at(occupied, (rows, starts), quantities)
+        np.add.at(occupied, (rows, ends), -quantities)
+    occupied = np.cumsum(occupied, axis=1)[:, :days]
+    available = quantity_total * days
+    idle = np.count_nonzero(occupied == 0, axis=1)
+
+    # По категориям: суммы по технике и простой — дни, когда не была занята ни одна единица категории
+    category_ids = sorted({eq.category_id for eq in equipments}, key=lambda value: (value is None, value))
+    category_index = {value: i for i, value in enumerate(category_ids)}
+    groups = np.array([category_index[eq.category_id] for eq in equipments], dtype=np.int64)
+    category_count = len(category_ids)
+    category_occupied = np.zeros((category_count, days), dtype=np.int64)
+    np.add.at(category_occupied, groups, occupied)
+    category_names = {eq.category_id: eq.category_name for eq in equipments}
+
+    def category_sum(values):
+        return np.bincount(groups, weights=values, minlength=category_count)
+
+    category_units = category_sum(quantity_total)
+    return {
+        "from": date_from.isoformat(),
+        "to": date_to.isoformat(),
+        "days": days,
+        "equipment": _rows(
+            [
+                {"id": eq.id, "title": eq.title, "category_id": eq.category_id, "quantity_total": eq.quantity_total}
+                for eq in equipments
+            ],
+            rented, available, revenue, quantity_total, idle,
+        ),
+        "categories": _rows(
+            [
+                {
+                    "category_id": value,
+                    "name": category_names[value],
+                    "equipment_count": int(n),
+                    "quantity_total": int(units),
+                }
+                for value, n, units in zip(category_ids, np.bincount(groups, minlength=category_count), category_units)
+            ],
+            category_sum(rented), category_sum(available), category_sum(revenue), category_units,
+            np.count_nonzero(category_occupied == 0, axis=1),
+        ),
+    }
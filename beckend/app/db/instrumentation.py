@@ -0,0 +1,94 @@
+import logging
+import os
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+
+logger = logging.getLogger("app.sql")
+
+# Сколько запросов к БД допустимо на один HTTP-запрос, прежде чем писать предупреждение
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", 20))
+# Сколько повторов одного и того же запроса за HTTP-запрос (не обязательно подряд) считаем подозрением на N+1
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 5))
+
+
+class RequestSQLStats:
+    """Статистика SQL-запросов в рамках одного HTTP-запроса"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n >= threshold]
+
+
+_current_stats: ContextVar[Optional[RequestSQLStats]] = ContextVar("request_sql_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    # Упавший запрос не доходит до after_cursor_execute: снимаем его отметку времени,
+    # иначе на соединениях из пула копятся устаревшие записи
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_time"):
+        conn.info["query_start_time"].pop()
+
+
+def instrument_engine(engine) -> None:
+    """Подключает подсчёт запросов и времени к движку (AsyncEngine или Engine)"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+async def sql_timing_middleware(request: Request, call_next):
+    stats = RequestSQLStats()
+    token = _current_stats.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current_stats.reset(token)
+    total_ms = (time.perf_counter() - started) * 1000
+    db_ms = stats.duration * 1000
+    response.headers.append(
+        "Server-Timing",
+        f'db;dur={db_ms:.1f};desc="{stats.count} queries", app;dur={total_ms:.1f}',
+    )
+
+    endpoint = f"{request.method} {request.url.path}"
+    if stats.count > SQL_QUERY_BUDGET:
+        logger.warning(
+            "%s issued %d queries (budget %d), db time %.1fms",
+            endpoint, stats.count, SQL_QUERY_BUDGET, db_ms,
+        )
+    for statement, times in stats.repeated(SQL_N_PLUS_ONE_THRESHOLD):
+        logger.warning(
+            "Possible N+1 in %s: statement executed %d times: %s",
+            endpoint, times, " ".join(statement.split())[:300],
+        )
+    return response
@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.api.category import router as category_router
@@ -11,9 +12,21 @@ from app.api.user import router as user_router
 from app.api.equipment_movement import router as equipment_movement_router
 from app.api.upload import router as upload_router
 from app.api.store import router as store_router
+from app.api.metrics import router as metrics_router
 from app.api import support_chat
+from app.db.session import engine, read_engine, mark_recent_write
+from app.db.instrumentation import instrument_engine, sql_timing_middleware
+from app.core.scheduler import run_startup_jobs, start_scheduler, stop_scheduler
 
-app = FastAPI(title="CRM аренды техники")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_startup_jobs()
+    # Фоновые задачи (просроченные аренды и т.п.)
+    scheduler_task = start_scheduler()
+    yield
+    await stop_scheduler(scheduler_task)
+
+app = FastAPI(title="CRM аренды техники", lifespan=lifespan)
 
 # Добавляем CORS middleware с улучшенными настройками
 app.add_middleware(
@@ -39,10 +52,24 @@ app.add_middleware(
         "Access-Control-Request-Method",
         "Access-Control-Request-Headers"
     ],
-    expose_headers=["*"],
+    expose_headers=["*", "X-Total-Count", "X-Next-Cursor", "Server-Timing"],
     max_age=86400,
 )
 
+# После успешного изменения данных клиент какое-то время читает из основной БД,
+# чтобы не увидеть устаревшие данные с реплики
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        mark_recent_write(request.headers.get("authorization"))
+    return response
+
+# Счётчик запросов к БД и времени на каждый HTTP-запрос (заголовок Server-Timing)
+instrument_engine(engine)
+instrument_engine(read_engine)
+app.middleware("http")(sql_timing_middleware)
+
 # Подключаем статические файлы для загруженных изображений
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -57,6 +84,7 @@ app.include_router(equipment_movement_router)
 app.include_router(upload_router)
 app.include_router(store_router)
 app.include_router(support_chat.router)
+app.include_router(metrics_router)
 
 @app.get("/")
 def root():
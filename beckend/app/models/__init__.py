@@ -7,6 +7,12 @@ from app.models.equipment_movement import EquipmentMovement
 from app.models.store import Store
 from app.models.client_comment import ClientComment
 from app.models.support_message import SupportMessage
+from app.models.equipment_occupancy import EquipmentDailyOccupancy
+from app.models.rental_payment import RentalPayment
+from app.models.store_daily_stats import StoreDailyStats
+from app.models.client_metrics import ClientMetrics
+from app.models.demand_forecast import DemandForecast
+from app.models.equipment_stock_snapshot import EquipmentStockSnapshot
 
 __all__ = [
     "Base",
@@ -18,5 +24,11 @@ __all__ = [
     "EquipmentMovement",
     "Store",
     "ClientComment",
-    "SupportMessage"
+    "SupportMessage",
+    "EquipmentDailyOccupancy",
+    "RentalPayment",
+    "StoreDailyStats",
+    "ClientMetrics",
+    "DemandForecast",
+    "EquipmentStockSnapshot"
 ] 
\ No newline at end of file
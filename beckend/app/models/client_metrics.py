@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, String, ForeignKey, Index
+from app.models.base import Base
+
+class ClientMetrics(Base):
+    """RFM-показатели клиента: пересчитываются фоновой задачей по изменённым арендам"""
+    __tablename__ = "client_metrics"
+    __table_args__ = (
+        Index("ix_client_metrics_store_segment", "store_id", "segment"),
+        Index("ix_client_metrics_store_monetary", "store_id", "monetary"),
+        Index("ix_client_metrics_store_last_rental", "store_id", "last_rental"),
+    )
+
+    client_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=True)
+    rentals = Column(Integer, nullable=False, default=0)  # frequency
+    monetary = Column(Float, nullable=False, default=0)  # сумма всех аренд (lifetime value)
+    avg_check = Column(Float, nullable=False, default=0)
+    first_rental = Column(Date, nullable=True)
+    last_rental = Column(Date, nullable=True)
+    avg_rental_days = Column(Float, nullable=False, default=0)
+    overdue_rentals = Column(Integer, nullable=False, default=0)
+    overdue_rate = Column(Float, nullable=False, default=0)
+    # Оценки 1..5 по квинтилям внутри магазина и сегмент
+    r_score = Column(Integer, nullable=True)
+    f_score = Column(Integer, nullable=True)
+    m_score = Column(Integer, nullable=True)
+    rfm = Column(Integer, nullable=True, index=True)  # например 545
+    segment = Column(String(32), nullable=True)
+    computed_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, Float, Date, DateTime, ForeignKey
+from app.models.base import Base
+
+class DemandForecast(Base):
+    """Прогноз спроса по категории на день (единиц в аренде); заполняется фоновой задачей"""
+    __tablename__ = "demand_forecasts"
+
+    category_id = Column(Integer, ForeignKey("categories.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False, index=True)
+    quantity = Column(Float, nullable=False, default=0)
+    computed_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,17 +1,35 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 from datetime import datetime
+from enum import Enum
+
+class MovementAction(str, Enum):
+    issued = "issued"  # выдача клиенту, quantity_available уменьшается
+    returned = "returned"  # возврат, quantity_available увеличивается
+    maintenance = "maintenance"  # отметка об обслуживании, остаток не меняет
+    adjusted = "adjusted"  # ручная корректировка остатка (quantity со знаком)
 
 class EquipmentMovement(Base):
+    # В PostgreSQL таблица секционирована по месяцам (RANGE по timestamp, см. миграцию),
+    # первичный ключ там (id, timestamp); id по-прежнему уникален за счёт последовательности
     __tablename__ = "equipment_movements"
+    __table_args__ = (
+        # Движения техники после контрольной точки (восстановление остатка)
+        Index("ix_equipment_movements_equipment_id_id", "equipment_id", "id"),
+        # Списки движений: фильтр + сортировка (timestamp, id)
+        Index("ix_equipment_movements_equipment_id_timestamp", "equipment_id", "timestamp"),
+        Index("ix_equipment_movements_performed_by_timestamp", "performed_by", "timestamp"),
+        Index("ix_equipment_movements_timestamp_id", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     equipment_id = Column(Integer, ForeignKey("equipment.id"), nullable=False)
     rental_id = Column(Integer, ForeignKey("rentals.id"), nullable=True)
-    action = Column(String, nullable=False)  # issued, returned, maintenance
+    action = Column(String, nullable=False)  # MovementAction
     quantity = Column(Integer, nullable=False)
-    performed_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Пусто для системных операций (например, пересчёт остатков)
+    performed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     equipment = relationship("Equipment", back_populates="movements")
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, Date, ForeignKey
+from app.models.base import Base
+
+class EquipmentDailyOccupancy(Base):
+    """Сколько единиц техники занято арендами в конкретный день (материализация для календаря)"""
+    __tablename__ = "equipment_daily_occupancy"
+
+    equipment_id = Column(Integer, ForeignKey("equipment.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    store_id = Column(Integer, ForeignKey("stores.id"), nullable=False, index=True)
+    quantity = Column(Integer, nullable=False, default=0)
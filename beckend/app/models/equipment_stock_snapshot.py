@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.models.base import Base
+
+class EquipmentStockSnapshot(Base):
+    """Контрольная точка журнала движений: остаток техники после движения movement_id.
+
+    Остаток восстанавливается как quantity_available снимка плюс движения с id > movement_id,
+    без пересчёта всей истории.
+    """
+    __tablename__ = "equipment_stock_snapshots"
+
+    equipment_id = Column(Integer, ForeignKey("equipment.id"), primary_key=True)
+    movement_id = Column(Integer, nullable=False, default=0)
+    quantity_available = Column(Integer, nullable=False, default=0)
+    taken_at = Column(DateTime(timezone=True), nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Float, Boolean, ForeignKey, Enum, DateTime
+from sqlalchemy import Column, Integer, String, Date, Float, Boolean, ForeignKey, Enum, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.models.base import Base
 import enum
@@ -13,6 +13,16 @@ class RentalStatus(str, enum.Enum):
 
 class Rental(Base):
     __tablename__ = "rentals"
+    __table_args__ = (
+        # Списки аренд: фильтры + сортировка (date_start, id) для keyset-пагинации
+        Index("ix_rentals_store_date_start_id", "store_id", "date_start", "id"),
+        Index("ix_rentals_store_status_date_start", "store_id", "status", "date_start"),
+        Index("ix_rentals_client_date_start", "client_id", "date_start"),
+        Index("ix_rentals_admin_date_start", "admin_id", "date_start"),
+        # Поиск изменённых аренд для инкрементального пересчёта client_metrics
+        Index("ix_rentals_updated_at", "updated_at"),
+        Index("ix_rentals_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     store_id = Column(Integer, ForeignKey("stores.id"), nullable=False)
@@ -30,13 +40,14 @@ class Rental(Base):
     admin = relationship("User", foreign_keys=[admin_id], back_populates="admin_rentals")
     equipment_movements = relationship("EquipmentMovement", back_populates="rental")
     items = relationship("RentalItem", back_populates="rental")
+    payments = relationship("RentalPayment", back_populates="rental")
 
 class RentalItem(Base):
     __tablename__ = "rental_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    rental_id = Column(Integer, ForeignKey("rentals.id"), nullable=False)
-    equipment_id = Column(Integer, ForeignKey("equipment.id"), nullable=False)
+    rental_id = Column(Integer, ForeignKey("rentals.id"), nullable=False, index=True)
+    equipment_id = Column(Integer, ForeignKey("equipment.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     price_per_day = Column(Float, nullable=False)
     is_deleted = Column(Boolean, default=False)
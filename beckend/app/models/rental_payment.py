@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Enum
+from sqlalchemy.orm import relationship
+from app.models.base import Base
+import enum
+from datetime import datetime
+
+class PaymentMethod(str, enum.Enum):
+    cash = "cash"
+    card = "card"
+
+class RentalPayment(Base):
+    """Оплата по аренде; у одной аренды может быть несколько (частичных) оплат"""
+    __tablename__ = "rental_payments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    rental_id = Column(Integer, ForeignKey("rentals.id"), nullable=False, index=True)
+    method = Column(Enum(PaymentMethod), nullable=False)
+    amount = Column(Float, nullable=False)
+    taken_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    rental = relationship("Rental", back_populates="payments")
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Date, Float, ForeignKey, LargeBinary
+from app.models.base import Base
+
+class StoreDailyStats(Base):
+    """Дневная сводка по арендам магазина (по дате начала аренды) для дашборда и статистики"""
+    __tablename__ = "store_daily_stats"
+
+    store_id = Column(Integer, ForeignKey("stores.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    rentals = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    cash = Column(Float, nullable=False, default=0)
+    card = Column(Float, nullable=False, default=0)
+    # HLL-скетч id клиентов (app/core/sketch.py): уникальные клиенты за любой период
+    clients_sketch = Column(LargeBinary, nullable=True)
+    booked = Column(Integer, nullable=False, default=0)
+    active = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    overdue = Column(Integer, nullable=False, default=0)
+    cancelled = Column(Integer, nullable=False, default=0)
@@ -4,10 +4,10 @@ from datetime import datetime
 
 class EquipmentMovementBase(BaseModel):
     equipment_id: int
-    rental_id: int
+    rental_id: Optional[int] = None
     action: str
     quantity: int
-    performed_by: int
+    performed_by: Optional[int] = None
 
 class EquipmentMovementRead(EquipmentMovementBase):
     id: int
@@ -1,7 +1,8 @@
 from pydantic import BaseModel
 from typing import List, Optional
-from datetime import date
+from datetime import date, datetime
 from app.models.rental import RentalStatus
+from app.models.rental_payment import PaymentMethod
 
 class RentalItemBase(BaseModel):
     equipment_id: int
@@ -42,4 +43,26 @@ class RentalRead(RentalBase):
     admin_full_name: Optional[str] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True 
+
+class RentalFilter(BaseModel):
+    status: Optional[RentalStatus] = None
+    date_from: Optional[date] = None  # по дате начала аренды, включительно
+    date_to: Optional[date] = None
+    client_id: Optional[int] = None
+    admin_id: Optional[int] = None
+    equipment_id: Optional[int] = None
+
+
+class RentalPaymentCreate(BaseModel):
+    method: PaymentMethod
+    amount: float
+
+class RentalPaymentRead(RentalPaymentCreate):
+    id: int
+    rental_id: int
+    taken_by: Optional[int] = None
+    timestamp: datetime
+
+    class Config:
+        from_attributes = True
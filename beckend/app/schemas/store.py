@@ -37,4 +37,15 @@ class StoreUpdate(BaseModel):
     about_html: Optional[str] = None
     map_iframe: Optional[str] = None
     telegram: Optional[str] = None
-    instagram: Optional[str] = None
\ No newline at end of file
+    instagram: Optional[str] = None
+
+class StoreOverview(BaseModel):
+    id: int
+    name: str
+    is_active: Optional[bool] = True
+    employees: int = 0
+    equipment: int = 0
+    active_rentals: int = 0
+    overdue_rentals: int = 0
+    rentals: int = 0
+    revenue: float = 0.0
@@ -55,6 +55,19 @@ class TokenData(BaseModel):
     user_id: Optional[int] = None
     role: Optional[UserRole] = None
 
+class Principal(BaseModel):
+    """Аутентифицированный пользователь, хранящийся в кэше авторизации"""
+    id: int
+    email: str
+    full_name: Optional[str] = None
+    role: UserRole
+    store_id: Optional[int] = None
+    is_active: Optional[bool] = True
+    permissions: Optional[dict] = None
+
+    class Config:
+        from_attributes = True
+
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     phone: Optional[str] = None
@@ -85,4 +98,24 @@ class ClientCommentRead(ClientCommentBase):
     author_full_name: Optional[str] = None
     
     class Config:
-        orm_mode = True 
\ No newline at end of file
+        orm_mode = True
+
+class ClientAnalyticsRead(BaseModel):
+    client_id: int
+    full_name: Optional[str] = None
+    phone: Optional[str] = None
+    store_id: Optional[int] = None
+    rentals: int
+    monetary: float
+    avg_check: float
+    first_rental: Optional[date] = None
+    last_rental: Optional[date] = None
+    avg_rental_days: float
+    overdue_rentals: int
+    overdue_rate: float
+    r_score: Optional[int] = None
+    f_score: Optional[int] = None
+    m_score: Optional[int] = None
+    rfm: Optional[int] = None
+    segment: Optional[str] = None
+    computed_at: Optional[datetime] = None
@@ -0,0 +1,120 @@
+"""Сравнение списка техники: ORM + joinedload + копия __dict__ против проекции с категорией в SQL.
+
+По умолчанию работает на отдельной временной SQLite-базе (нужен aiosqlite), рабочую БД не трогает.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.equipment import equipment_list_adapter
+from app.crud.equipment import get_equipments, get_equipment_rows
+from app.models import Base, Category, Equipment, Store
+
+
+async def seed(session_factory, items: int, categories: int) -> int:
+    async with session_factory() as session:
+        store = Store(name="Bench", slug="bench", address="-", phone="-", email="bench@example.com")
+        session.add(store)
+        await session.flush()
+        category_ids = []
+        for i in range(categories):
+            category = Category(name=f"Категория {i}", store_id=store.id)
+            session.add(category)
+            await session.flush()
+            category_ids.append(category.id)
+        await session.execute(
+            insert(Equipment),
+            [
+                {
+                    "title": f"Техника {i}",
+                    "description": "Описание " * 5,
+                    "store_id": store.id,
+                    "category_id": category_ids[i % categories],
+                    "quantity_total": 5,
+                    "quantity_available": 3,
+                    "price_per_day": 100 + i % 50,
+                    "status": "available",
+                    "is_deleted": False,
+                }
+                for i in range(items)
+            ],
+        )
+        await session.commit()
+        return store.id
+
+
+async def orm_path(session_factory, items: int, store_id: int) -> bytes:
+    """Как было: ORM-объекты, category через joinedload, копия __dict__ и сериализация как в FastAPI"""
+    async with session_factory() as session:
+        equipments = await get_equipments(session, 0, items, store_id)
+        result = []
+        for eq in equipments:
+            item = eq.__dict__.copy()
+            item["category_name"] = eq.category.name if getattr(eq, "category", None) else None
+            result.append(item)
+        validated = equipment_list_adapter.validate_python(result)
+        content = equipment_list_adapter.dump_python(validated, mode="json")
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def projection_path(session_factory, items: int, store_id: int) -> bytes:
+    """Как стало: только поля ответа, название категории из SQL, готовый сериализатор"""
+    async with session_factory() as session:
+        rows = await get_equipment_rows(session, 0, items, store_id)
+        return equipment_list_adapter.dump_json(equipment_list_adapter.validate_python(rows))
+
+
+async def measure(name: str, path, session_factory, items: int, store_id: int, repeats: int) -> None:
+    await path(session_factory, items, store_id)  # прогрев
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    for _ in range(repeats):
+        body = await path(session_factory, items, store_id)
+    wall = (time.perf_counter() - started) / repeats
+    cpu = (time.process_time() - cpu_started) / repeats
+
+    tracemalloc.start()
+    await path(session_factory, items, store_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<11} {wall * 1000:8.1f} ms  cpu {cpu / items * 1e6:6.1f} us/row  "
+        f"peak {peak / 1024 / 1024:6.1f} MiB ({peak / items:7.0f} B/row)  response {len(body) / 1024:.0f} KiB"
+    )
+
+
+async def main(database_url: str, items: int, categories: int, repeats: int) -> None:
+    engine = create_async_engine(database_url)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    store_id = await seed(session_factory, items, categories)
+    print(f"{items} items, {categories} categories, {repeats} runs each")
+    # Оба пути должны отдавать один и тот же список
+    orm_body = json.loads(await orm_path(session_factory, items, store_id))
+    projection_body = json.loads(await projection_path(session_factory, items, store_id))
+    assert sorted(orm_body, key=lambda row: row["id"]) == sorted(projection_body, key=lambda row: row["id"])
+    await measure("orm", orm_path, session_factory, items, store_id, repeats)
+    await measure("projection", projection_path, session_factory, items, store_id, repeats)
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк списка техники (ORM против проекции)")
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--database-url", default=None, help="по умолчанию — временная SQLite-база")
+    args = parser.parse_args()
+    database_url = args.database_url
+    if database_url is None:
+        database_url = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    asyncio.run(main(database_url, args.items, args.categories, args.repeats))
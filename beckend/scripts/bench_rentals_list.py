@@ -0,0 +1,209 @@
+"""Сравнение страницы GET /rentals: ORM + selectinload + запросы пользователей против JSON из базы.
+
+По умолчанию работает на отдельной временной SQLite-базе (нужен aiosqlite). С --database-url
+(например, postgresql+asyncpg://...) таблицы создаются во временной схеме, которая удаляется
+после замера; рабочие таблицы не трогаются.
+
+CPU — время процесса приложения; на PostgreSQL работа самого сервера в него не входит,
+её видно по разнице wall и cpu.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+from typing import List
+
+from pydantic import TypeAdapter
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import selectinload, sessionmaker
+
+from app.crud.rental import get_rentals
+from app.models import Base, Equipment, Rental, RentalItem, Store, User
+from app.models.rental import RentalStatus
+from app.models.user import UserRole
+from app.schemas.rental import RentalRead
+
+rental_list_adapter = TypeAdapter(List[RentalRead])
+
+
+async def seed(session_factory, rentals: int, items_per_rental: int) -> int:
+    async with session_factory() as session:
+        store = Store(name="Bench", slug="bench", address="-", phone="-", email="bench@example.com")
+        session.add(store)
+        await session.flush()
+        admin_ids = (await session.execute(
+            insert(User).returning(User.id),
+            [
+                {"email": f"admin{i}@example.com", "hashed_password": "-", "full_name": f"Админ {i}",
+                 "role": UserRole.store_admin, "store_id": store.id, "is_active": True}
+                for i in range(5)
+            ],
+        )).scalars().all()
+        client_ids = (await session.execute(
+            insert(User).returning(User.id),
+            [
+                {"email": f"client{i}@example.com", "hashed_password": "-", "full_name": f"Клиент Клиентович {i}",
+                 "phone": f"+7900{i:07d}", "role": UserRole.client, "store_id": store.id, "is_active": True}
+                for i in range(200)
+            ],
+        )).scalars().all()
+        equipment_ids = (await session.execute(
+            insert(Equipment).returning(Equipment.id),
+            [
+                {"title": f"Техника {i}", "store_id": store.id, "quantity_total": 100, "quantity_available": 100,
+                 "price_per_day": 100 + i, "is_deleted": False}
+                for i in range(50)
+            ],
+        )).scalars().all()
+        start = date.today() - timedelta(days=365)
+        statuses = list(RentalStatus)
+        rental_ids = (await session.execute(
+            insert(Rental).returning(Rental.id),
+            [
+                {
+                    "store_id": store.id,
+                    "client_id": client_ids[i % len(client_ids)],
+                    "admin_id": admin_ids[i % len(admin_ids)],
+                    "date_start": start + timedelta(days=i % 365),
+                    "date_end": start + timedelta(days=i % 365 + 3),
+                    "total_amount": 1500.0 + i,
+                    "status": statuses[i % len(statuses)],
+                    "comment": "Комментарий к аренде" if i % 3 == 0 else None,
+                    "is_deleted": False,
+                }
+                for i in range(rentals)
+            ],
+        )).scalars().all()
+        await session.execute(
+            insert(RentalItem),
+            [
+                {
+                    "rental_id": rental_id,
+                    "equipment_id": equipment_ids[(i + j) % len(equipment_ids)],
+                    "quantity": 1 + j,
+                    "price_per_day": 100.0 + j,
+                    "is_deleted": False,
+                }
+                for i, rental_id in enumerate(rental_ids)
+                for j in range(items_per_rental)
+            ],
+        )
+        await session.commit()
+        return store.id
+
+
+async def orm_path(session_factory, limit: int, store_id: int) -> bytes:
+    """Как было: ORM-объекты, selectinload позиций, два запроса пользователей, копия __dict__"""
+    async with session_factory() as session:
+        query = (
+            select(Rental)
+            .options(selectinload(Rental.items))
+            .where(Rental.is_deleted == False, Rental.store_id == store_id)
+            .order_by(Rental.date_start.desc(), Rental.id.desc())
+            .limit(limit)
+        )
+        rentals = (await session.execute(query)).scalars().all()
+        client_ids = list({r.client_id for r in rentals if r.client_id})
+        admin_ids = list({r.admin_id for r in rentals if r.admin_id})
+        clients = {user.id: user for user in (await session.execute(select(User).where(User.id.in_(client_ids)))).scalars()}
+        admins = {user.id: user for user in (await session.execute(select(User).where(User.id.in_(admin_ids)))).scalars()}
+        result = []
+        for r in rentals:
+            client = clients.get(r.client_id)
+            admin = admins.get(r.admin_id)
+            rental_dict = r.__dict__.copy()
+            rental_dict["items"] = r.items
+            rental_dict["client_full_name"] = client.full_name if client else None
+            rental_dict["client_email"] = client.email if client else None
+            rental_dict["client_phone"] = client.phone if client else None
+            rental_dict["admin_full_name"] = admin.full_name if admin else None
+            result.append(rental_dict)
+        # Сериализация как у FastAPI с response_model: валидация, dump в python и json.dumps
+        validated = rental_list_adapter.validate_python(result, from_attributes=True)
+        content = rental_list_adapter.dump_python(validated, mode="json")
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def projection_path(session_factory, limit: int, store_id: int) -> bytes:
+    """Как стало: JSON каждой аренды собирает база, приложение склеивает массив, как в GET /rentals"""
+    async with session_factory() as session:
+        rentals = await get_rentals(session, 0, limit, store_id)
+        return ("[" + ",".join(row.json for row in rentals) + "]").encode("utf-8")
+
+
+async def measure(name: str, path, session_factory, limit: int, store_id: int, repeats: int) -> float:
+    await path(session_factory, limit, store_id)  # прогрев
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    for _ in range(repeats):
+        body = await path(session_factory, limit, store_id)
+    wall = (time.perf_counter() - started) / repeats
+    cpu = (time.process_time() - cpu_started) / repeats
+    print(
+        f"{name:<11} wall {wall * 1000:7.1f} ms  cpu {cpu * 1000:7.1f} ms  "
+        f"({cpu / limit * 1e6:6.1f} us/rental)  response {len(body) / 1024:.0f} KiB"
+    )
+    return cpu
+
+
+def _normalize(body: bytes) -> list:
+    rows = json.loads(body)
+    for row in rows:
+        row["items"] = sorted(row["items"], key=lambda item: item["id"])
+    return rows
+
+
+async def main(database_url: str, rentals: int, items_per_rental: int, limit: int, repeats: int) -> None:
+    schema = None
+    connect_args = {}
+    if database_url.startswith("postgresql"):
+        schema = f"bench_{uuid.uuid4().hex[:12]}"
+        admin_engine = create_async_engine(database_url)
+        async with admin_engine.begin() as conn:
+            await conn.execute(text(f'CREATE SCHEMA "{schema}"'))
+        await admin_engine.dispose()
+        connect_args = {"server_settings": {"search_path": schema}}
+    engine = create_async_engine(database_url, connect_args=connect_args)
+    try:
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        store_id = await seed(session_factory, rentals, items_per_rental)
+        if schema:
+            async with engine.begin() as conn:
+                await conn.execute(text("ANALYZE"))
+        print(f"{engine.dialect.name}: {rentals} rentals x {items_per_rental} items, page {limit}, {repeats} runs each")
+        # Оба пути должны отдавать одну и ту же страницу, и она должна проходить схему RentalRead
+        projection_body = await projection_path(session_factory, limit, store_id)
+        rental_list_adapter.validate_json(projection_body)
+        assert _normalize(await orm_path(session_factory, limit, store_id)) == _normalize(projection_body)
+        orm_cpu = await measure("orm", orm_path, session_factory, limit, store_id, repeats)
+        projection_cpu = await measure("projection", projection_path, session_factory, limit, store_id, repeats)
+        print(f"cpu per rental: {orm_cpu / projection_cpu:.1f}x lower")
+    finally:
+        await engine.dispose()
+        if schema:
+            admin_engine = create_async_engine(database_url)
+            async with admin_engine.begin() as conn:
+                await conn.execute(text(f'DROP SCHEMA "{schema}" CASCADE'))
+            await admin_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк страницы списка аренд (ORM против JSON из базы)")
+    parser.add_argument("--rentals", type=int, default=5_000)
+    parser.add_argument("--items", type=int, default=3, help="позиций в аренде")
+    parser.add_argument("--limit", type=int, default=1_000, help="размер страницы")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--database-url", default=None, help="по умолчанию — временная SQLite-база")
+    args = parser.parse_args()
+    database_url = args.database_url
+    if database_url is None:
+        database_url = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    asyncio.run(main(database_url, args.rentals, args.items, args.limit, args.repeats))
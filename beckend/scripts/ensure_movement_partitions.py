@@ -0,0 +1,20 @@
+import argparse
+import asyncio
+
+from app.db.session import AsyncSessionLocal
+from app.crud.equipment_movement import ensure_movement_partitions, PARTITION_MONTHS_AHEAD
+
+
+async def main(months_ahead: int) -> None:
+    async with AsyncSessionLocal() as session:
+        created = await ensure_movement_partitions(session, months_ahead)
+    for name in created:
+        print(f"Created partition {name}")
+    print(f"{len(created)} partitions created")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Создание месячных секций журнала движений техники (PostgreSQL)")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD, help="на сколько месяцев вперёд")
+    args = parser.parse_args()
+    asyncio.run(main(args.months_ahead))
@@ -0,0 +1,177 @@
+"""Нагрузочная проверка: задержка дешёвого эндпоинта во время шторма логинов.
+
+Скрипт поднимает приложение через uvicorn в отдельном процессе на временной SQLite-базе
+(нужен aiosqlite), сначала измеряет задержку пробного эндпоинта без нагрузки, затем —
+пока --concurrency клиентов непрерывно логинятся. С --inline-hashing bcrypt выполняется
+прямо в event loop, как было до пула хэширования, — для сравнения.
+
+    python -m scripts.load_login_storm --concurrency 50 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import httpx
+
+EMAIL = "storm@example.com"
+PASSWORD = "storm-password"
+
+
+async def seed(database_url: str) -> None:
+    # Импорты приложения — после того как DATABASE_URL выставлен в окружении
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from app.core.auth import get_password_hash
+    from app.models import Base, Store, User
+    from app.models.user import UserRole
+
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        store = Store(name="Storm", slug="storm", address="-", phone="-", email="storm-store@example.com")
+        session.add(store)
+        await session.flush()
+        session.add(User(
+            email=EMAIL,
+            hashed_password=get_password_hash(PASSWORD),
+            full_name="Storm",
+            role=UserRole.store_admin,
+            store_id=store.id,
+        ))
+        await session.commit()
+    await engine.dispose()
+
+
+def serve(port: int, inline_hashing: bool) -> None:
+    import uvicorn
+    import app.api.auth as auth_api
+    from app.core.auth import verify_password
+    from app.main import app
+
+    if inline_hashing:
+        async def verify_inline(plain_password: str, hashed_password: str) -> bool:
+            return verify_password(plain_password, hashed_password)
+
+        auth_api.verify_password_async = verify_inline
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def percentiles(latencies: list) -> str:
+    if len(latencies) < 2:
+        return "недостаточно замеров"
+    cuts = statistics.quantiles(latencies, n=100)
+    return (
+        f"n={len(latencies):5d}  p50 {cuts[49] * 1000:7.1f} ms  p95 {cuts[94] * 1000:7.1f} ms  "
+        f"p99 {cuts[98] * 1000:7.1f} ms  max {max(latencies) * 1000:7.1f} ms"
+    )
+
+
+async def probe(client: httpx.AsyncClient, path: str, token: str, stop: asyncio.Event, interval: float) -> list:
+    latencies = []
+    headers = {"Authorization": f"Bearer {token}"}
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - started)
+        response.raise_for_status()
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def login_worker(client: httpx.AsyncClient, stop: asyncio.Event, statuses: Counter, timings: list) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+        timings.append(time.perf_counter() - started)
+        statuses[response.status_code] += 1
+
+
+async def run_phase(client, path, token, duration, interval, concurrency) -> tuple:
+    stop = asyncio.Event()
+    statuses: Counter = Counter()
+    login_timings: list = []
+    workers = [asyncio.create_task(login_worker(client, stop, statuses, login_timings)) for _ in range(concurrency)]
+    probe_task = asyncio.create_task(probe(client, path, token, stop, interval))
+    await asyncio.sleep(duration)
+    stop.set()
+    latencies = await probe_task
+    await asyncio.gather(*workers)
+    return latencies, statuses, login_timings
+
+
+async def main(base_url: str, path: str, duration: float, interval: float, concurrency: int) -> None:
+    limits = httpx.Limits(max_connections=concurrency + 10, max_keepalive_connections=concurrency + 10)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        response = await client.post("/auth/login", data={"username": EMAIL, "password": PASSWORD})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        await client.get(path, headers={"Authorization": f"Bearer {token}"})  # прогрев кэша авторизации
+
+        latencies, _, _ = await run_phase(client, path, token, duration, interval, 0)
+        print(f"{path} без нагрузки:       {percentiles(latencies)}")
+        latencies, statuses, login_timings = await run_phase(client, path, token, duration, interval, concurrency)
+        print(f"{path} во время логинов:   {percentiles(latencies)}")
+        print(f"/auth/login x{concurrency}:          {percentiles(login_timings)}")
+        print(
+            f"логинов {sum(statuses.values())} за {duration:.0f} с "
+            f"({sum(statuses.values()) / duration:.1f}/с), статусы: {dict(sorted(statuses.items()))}"
+        )
+
+
+async def wait_ready(base_url: str, server: subprocess.Popen) -> None:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        for _ in range(100):
+            if server.poll() is not None:
+                raise RuntimeError("сервер завершился при запуске")
+            try:
+                await client.get("/")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("сервер не поднялся")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка эндпоинтов во время шторма логинов")
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременных логинов")
+    parser.add_argument("--duration", type=float, default=10, help="секунд на каждую фазу")
+    parser.add_argument("--interval", type=float, default=0.02, help="пауза между пробными запросами")
+    parser.add_argument("--path", default="/auth/me", help="пробный эндпоинт")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--inline-hashing", action="store_true", help="bcrypt в event loop, как до пула")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.inline_hashing)
+        sys.exit(0)
+
+    database_url = "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "storm.db")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    asyncio.run(seed(database_url))
+
+    command = [sys.executable, "-m", "scripts.load_login_storm", "--serve", "--port", str(args.port)]
+    if args.inline_hashing:
+        command.append("--inline-hashing")
+    server = subprocess.Popen(command, env=os.environ.copy(), cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        asyncio.run(wait_ready(base_url, server))
+        print(
+            f"{'bcrypt в event loop' if args.inline_hashing else 'bcrypt в пуле'}, "
+            f"PASSWORD_HASH_WORKERS={os.getenv('PASSWORD_HASH_WORKERS', 2)}, "
+            f"PASSWORD_HASH_MAX_PENDING={os.getenv('PASSWORD_HASH_MAX_PENDING', 64)}, CPU: {os.cpu_count()}"
+        )
+        asyncio.run(main(base_url, args.path, args.duration, args.interval, args.concurrency))
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,19 @@
+import asyncio
+
+from sqlalchemy import delete
+
+from app.db.session import AsyncSessionLocal
+from app.crud.client_metrics import run_client_metrics
+from app.models.client_metrics import ClientMetrics
+
+
+async def main() -> None:
+    async with AsyncSessionLocal() as session:
+        # Пустая таблица — полный пересчёт по всем арендам
+        await session.execute(delete(ClientMetrics))
+        scored = await run_client_metrics(session)
+        print(f"Client metrics rebuilt for {scored} clients")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
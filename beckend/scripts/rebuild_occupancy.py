@@ -0,0 +1,27 @@
+import argparse
+import asyncio
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from app.db.session import AsyncSessionLocal
+from app.crud.occupancy import rebuild_occupancy
+from app.models.store import Store
+
+
+async def main(days_back: int, days_ahead: int) -> None:
+    date_from = date.today() - timedelta(days=days_back)
+    date_to = date.today() + timedelta(days=days_ahead)
+    async with AsyncSessionLocal() as session:
+        store_ids = (await session.execute(select(Store.id))).scalars().all()
+        for store_id in store_ids:
+            await rebuild_occupancy(session, store_id, date_from, date_to)
+            print(f"Store {store_id}: occupancy rebuilt for {date_from}..{date_to}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчёт дневной занятости техники")
+    parser.add_argument("--days-back", type=int, default=365)
+    parser.add_argument("--days-ahead", type=int, default=365)
+    args = parser.parse_args()
+    asyncio.run(main(args.days_back, args.days_ahead))
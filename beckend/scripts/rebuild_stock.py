@@ -0,0 +1,21 @@
+import argparse
+import asyncio
+
+from app.db.session import AsyncSessionLocal
+from app.crud.stock import checkpoint_stock, rebuild_quantity_available
+
+
+async def main(checkpoint: bool) -> None:
+    async with AsyncSessionLocal() as session:
+        changed = await rebuild_quantity_available(session)
+        print(f"quantity_available fixed for {changed} equipment")
+        if checkpoint:
+            snapshots = await checkpoint_stock(session)
+            print(f"Stock checkpoint written for {snapshots} equipment")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчёт quantity_available по журналу движений техники")
+    parser.add_argument("--checkpoint", action="store_true", help="после пересчёта записать контрольную точку")
+    args = parser.parse_args()
+    asyncio.run(main(args.checkpoint))
@@ -0,0 +1,33 @@
+import argparse
+import asyncio
+from datetime import date, timedelta
+
+from sqlalchemy import select, func
+
+from app.db.session import AsyncSessionLocal
+from app.crud.store_stats import rebuild_store_stats
+from app.models.rental import Rental
+from app.models.store import Store
+
+
+async def main(days_back: int, days_ahead: int) -> None:
+    async with AsyncSessionLocal() as session:
+        store_ids = (await session.execute(select(Store.id))).scalars().all()
+        for store_id in store_ids:
+            if days_back is None:
+                # По умолчанию — вся история магазина
+                first_day = await session.scalar(select(func.min(Rental.date_start)).where(Rental.store_id == store_id))
+                date_from = first_day or date.today()
+            else:
+                date_from = date.today() - timedelta(days=days_back)
+            date_to = date.today() + timedelta(days=days_ahead)
+            await rebuild_store_stats(session, store_id, date_from, date_to)
+            print(f"Store {store_id}: daily stats rebuilt for {date_from}..{date_to}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пересчёт дневной сводки магазинов (store_daily_stats)")
+    parser.add_argument("--days-back", type=int, default=None, help="по умолчанию — с первой аренды")
+    parser.add_argument("--days-ahead", type=int, default=365)
+    args = parser.parse_args()
+    asyncio.run(main(args.days_back, args.days_ahead))
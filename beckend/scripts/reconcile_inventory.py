@@ -0,0 +1,30 @@
+import argparse
+import asyncio
+
+from app.db.session import AsyncSessionLocal
+from app.crud.inventory import reconcile_inventory
+
+
+async def main(store_id: int, fix: bool) -> None:
+    async with AsyncSessionLocal() as session:
+        report = await reconcile_inventory(session, store_id=store_id, fix=fix)
+    for item in report["items"]:
+        print(
+            f"#{item['equipment_id']} {item['title']}: available {item['quantity_available']}, ledger {item['ledger']}, "
+            f"expected {item['expected']} (total {item['quantity_total']}, issued {item['issued']}), "
+            f"drift {item['drift']:+d}, ledger drift {item['ledger_drift']:+d}"
+        )
+    action = "fixed" if fix else "found"
+    print(
+        f"Checked {report['equipment_checked']} equipment, drift {action} in {report['drifted']} "
+        f"(total {report['total_abs_drift']} units), ledger drift {action} in {report['ledger_drifted']} "
+        f"(total {report['total_abs_ledger_drift']} units)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сверка quantity_available с выданной техникой")
+    parser.add_argument("--store-id", type=int, default=None)
+    parser.add_argument("--fix", action="store_true", help="исправить расхождения")
+    args = parser.parse_args()
+    asyncio.run(main(args.store_id, args.fix))